@@ -1,82 +1,163 @@
 import json
 import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime # Import datetime
 
+try:
+    # orjson parses straight from UTF-8 bytes in native code
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# JSON files written by flow-maker.py: name -> (filename, required)
+FLOW_FILES = {
+    'metadata': ("1.json", True),
+    'tree': ("2.json", True),
+    'timeline': ("3.json", False),
+    'challenges': ("4.json", False),
+    'adoption': ("5.json", False),
+    'implementation': ("6.json", False),
+    'roi': ("7.json", False),
+    'future_tech': ("8.json", False),
+    'specs': ("9.json", False),
+}
+
+# Adoption phases in display order (automation-adoption.py asks for phase1..phase4)
+ADOPTION_PHASE_KEYS = tuple(f"phase{i}" for i in range(1, 10))
+
+# ROI scales in display order (return-analysis.py asks for these three keys)
+ROI_SCALES = ('small_scale', 'medium_scale', 'large_scale')
+
+# Future technology categories (key in 8.json -> display name), in display order
+FUTURE_TECH_CATEGORIES = (
+    ('sensory_systems', 'Sensory Systems'),
+    ('control_systems', 'Control Systems'),
+    ('mechanical_systems', 'Mechanical Systems'),
+    ('software_integration', 'Software Integration'),
+)
+
+# Text surrounded by ** in the source data, rendered as bold
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+
+# First run of digits in a progress value such as "45%"
+_DIGITS_RE = re.compile(r'\d+')
+
+# Standard contributors text shown on every page
+CONTRIBUTORS_TEXT = "This workflow was developed using Iterative AI analysis with input from subject matter experts and automation engineers."
+
+@lru_cache(maxsize=256)
+def read_json_file_cached(file_path, mtime_ns):
+    """Parse a JSON file, cached per (path, modification time)."""
+    # Read raw bytes and let the parser handle UTF-8 decoding
+    with open(file_path, 'rb') as file:
+        return json_loads(file.read())
+
 def read_json_file(file_path):
-    """Read a JSON file and return its contents as a Python dictionary."""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return json.load(file)
+    """Read a JSON file and return its contents as a Python dictionary.
+
+    Parsed results are shared between calls until the file changes on disk,
+    so callers must copy before modifying them.
+    """
+    return read_json_file_cached(file_path, os.stat(file_path).st_mtime_ns)
+
+def read_optional_json_file(file_path):
+    """Read a JSON file, falling back to an empty dictionary if it doesn't exist."""
+    if not os.path.exists(file_path):
+        return {}
+    return read_json_file(file_path)
+
+def read_flow_files(files_dir_path):
+    """Read all flow JSON files concurrently and return them keyed by name.
+
+    The reads are independent and I/O-bound, so overlapping them in threads makes
+    the load phase take roughly as long as the slowest file rather than the sum.
+    """
+    with ThreadPoolExecutor(max_workers=len(FLOW_FILES)) as executor:
+        futures = {
+            name: executor.submit(
+                read_json_file if required else read_optional_json_file,
+                os.path.join(files_dir_path, filename)
+            )
+            for name, (filename, required) in FLOW_FILES.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
 
+def alt_file_sort_key(filename):
+    """Sort alternative files by their number, so alt10.json comes after alt2.json."""
+    number_match = _DIGITS_RE.search(filename)
+    return (int(number_match.group()) if number_match else 0, filename)
+
+@lru_cache(maxsize=4096)
 def process_bold_text(text):
     """Replace text surrounded by ** with HTML bold tags."""
-    import re
+    # Most strings carry no markers; skip the regex scan for those
+    if '**' not in text:
+        return text
     # Find all text surrounded by ** and replace with <strong> tags
-    return re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+    return _BOLD_RE.sub(r'<strong>\1</strong>', text)
 
 def generate_tree_preview_text(tree_data):
     """Generate a text representation of a tree suitable for the approach preview."""
     # Use the first level (root) and second level (main steps) of the tree for the preview
-    root_name = tree_data.get("tree", {}).get("step", "approach_root").lower().replace(" ", "_")
+    root = tree_data.get("tree", {})
+    root_name = root.get("step", "approach_root").lower().replace(" ", "_")
     
     # Start with the root node
     lines = [root_name]
     
     # Add child nodes with ASCII art tree structure
-    children = tree_data.get("tree", {}).get("children", [])
+    children = root.get("children", [])
+    last_child = len(children) - 1
     for i, child in enumerate(children):
         # Get a shortened UUID to use in the preview
-        uuid_part = child.get("uuid", "")[:4] if "uuid" in child else str(i)
+        uuid = child.get("uuid")
+        uuid_part = uuid[:4] if uuid is not None else str(i)
         
         child_step = child.get("step", "step").lower().replace(" ", "_")
         # Make the child step name and uuid shorter for the preview
         child_name = f"{child_step}_{uuid_part}"
         
-        # Last child has a different prefix
-        if i == len(children) - 1:
-            lines.append(f"└── {child_name}")
-        else:
-            lines.append(f"├── {child_name}")
+        # Last child closes the branch, and its subtree has no vertical rule
+        branch, indent = ("└── ", "    ") if i == last_child else ("├── ", "│   ")
+        lines.append(f"{branch}{child_name}")
         
         # Add grandchildren for this child with proper indentation
         grandchildren = child.get("children", [])
+        last_grandchild = len(grandchildren) - 1
         for j, grandchild in enumerate(grandchildren):
             # Get a shortened UUID for the grandchild
-            g_uuid_part = grandchild.get("uuid", "")[:4] if "uuid" in grandchild else str(j)
+            g_uuid = grandchild.get("uuid")
+            g_uuid_part = g_uuid[:4] if g_uuid is not None else str(j)
             
             g_step = grandchild.get("step", "substep").lower().replace(" ", "_")
             # Make the grandchild step name and uuid shorter for the preview
             g_name = f"{g_step}_{g_uuid_part}"
             
-            # Use different prefixes based on whether this is the last child and last grandchild
-            if i == len(children) - 1:  # Last child
-                if j == len(grandchildren) - 1:  # Last grandchild
-                    lines.append(f"    └── {g_name}")
-                else:
-                    lines.append(f"    ├── {g_name}")
-            else:  # Not last child
-                if j == len(grandchildren) - 1:  # Last grandchild
-                    lines.append(f"│   └── {g_name}")
-                else:
-                    lines.append(f"│   ├── {g_name}")
-                    
+            # Indent under the parent's branch; last grandchild closes its own branch
+            g_branch = "└── " if j == last_grandchild else "├── "
+            lines.append(f"{indent}{g_branch}{g_name}")
+
             # Limit the preview to a reasonable size
-            if j >= 2 and len(grandchildren) > 4:
-                lines.append(f"│   └── ... ({len(grandchildren) - 3} more steps)")
+            if j >= 2 and last_grandchild > 3:
+                lines.append(f"│   └── ... ({last_grandchild - 2} more steps)")
                 break
         
         # Limit the preview to a reasonable number of main steps
-        if i >= 2 and len(children) > 4:
-            lines.append(f"└── ... ({len(children) - 3} more steps)")
+        if i >= 2 and last_child > 3:
+            lines.append(f"└── ... ({last_child - 2} more steps)")
             break
     
     return "\n".join(lines)
 
 def process_metadata(metadata, breadcrumb_str):
     """Process metadata, add contributors/date, and incorporate breadcrumbs."""
-    result = metadata.get('page_metadata', {})
+    # Work on a copy so the cached metadata stays untouched
+    result = dict(metadata.get('page_metadata', {}))
 
     # Handle progress percentage (use existing logic)
     if 'automation_progress' in result:
@@ -89,10 +170,8 @@ def process_metadata(metadata, breadcrumb_str):
         progress_text = "0"  # Default fallback to 0 if missing
 
     # Extract numeric value from progress text
-    try:
-        result['progress_percentage'] = int(''.join(filter(str.isdigit, str(progress_text))))
-    except ValueError:
-        result['progress_percentage'] = 0 # Fallback if conversion fails
+    progress_match = _DIGITS_RE.search(str(progress_text))
+    result['progress_percentage'] = int(progress_match.group()) if progress_match else 0 # Fallback if no digits
 
     # Process summary: Use 'explanatory_text' as fallback for 'summary'
     summary_content = result.get('summary', result.get('explanatory_text'))
@@ -101,10 +180,10 @@ def process_metadata(metadata, breadcrumb_str):
         # Ensure summary is a list of strings (paragraphs)
         if isinstance(summary_content, str):
             # Split string by double newlines to get paragraphs, stripping whitespace
-            result['summary_paragraphs'] = [p.strip() for p in summary_content.split('\n\n') if p.strip()]
+            result['summary_paragraphs'] = [p for p in map(str.strip, summary_content.split('\n\n')) if p]
         elif isinstance(summary_content, list):
             # Assume it's already a list of paragraphs (strings)
-            result['summary_paragraphs'] = [str(p).strip() for p in summary_content if str(p).strip()]
+            result['summary_paragraphs'] = [p for p in (str(item).strip() for item in summary_content) if p]
         else:
             result['summary_paragraphs'] = [] # Fallback for unexpected types
     else:
@@ -117,7 +196,7 @@ def process_metadata(metadata, breadcrumb_str):
     result.setdefault('status', result.get('automation_status', 'Unknown'))
     result.setdefault('contributors', 'N/A')
     # Set standard contributors text
-    result['contributors'] = "This workflow was developed using Iterative AI analysis with input from subject matter experts and automation engineers."
+    result['contributors'] = CONTRIBUTORS_TEXT
 
     # Set last updated date
     now = datetime.now()
@@ -155,187 +234,231 @@ def process_breadcrumbs(breadcrumbs_str):
 
     return result
 
-def main():
-    # Correct argument check: script name + 2 arguments = 3
-    if len(sys.argv) != 3:
-        print("Usage: python assemble.py <files_dir> <output_dir>")
-        sys.exit(1)
-
-    files_dir_path = sys.argv[1] # This should be the directory path, e.g., flow/ce6c090c...
-    output_dir = sys.argv[2]
-
-    # Correct path derivation: JSON files are directly inside files_dir_path
-    metadata_path = os.path.join(files_dir_path, "1.json")
-    tree_path = os.path.join(files_dir_path, "2.json")
-    timeline_path = os.path.join(files_dir_path, "3.json")
-    challenges_path = os.path.join(files_dir_path, "4.json")
-    adoption_path = os.path.join(files_dir_path, "5.json")
-    implementation_path = os.path.join(files_dir_path, "6.json")
-    roi_path = os.path.join(files_dir_path, "7.json")
-    future_tech_path = os.path.join(files_dir_path, "8.json")
-    specs_path = os.path.join(files_dir_path, "9.json")
-
-    try:
-        # Load all required JSON data
-        metadata_raw = read_json_file(metadata_path)
-        tree_data = read_json_file(tree_path)
-
-        # Load optional JSON data with fallbacks
-        timeline_data = read_json_file(timeline_path) if os.path.exists(timeline_path) else {}
-        challenges_data = read_json_file(challenges_path) if os.path.exists(challenges_path) else {}
-        adoption_data = read_json_file(adoption_path) if os.path.exists(adoption_path) else {}
-        implementation_data = read_json_file(implementation_path) if os.path.exists(implementation_path) else {}
-        roi_data = read_json_file(roi_path) if os.path.exists(roi_path) else {}
-        future_tech_data = read_json_file(future_tech_path) if os.path.exists(future_tech_path) else {}
-        specs_data = read_json_file(specs_path) if os.path.exists(specs_path) else {}
-
-        # --- Read Breadcrumbs File ---
-        breadcrumb_file_path = os.path.join(files_dir_path, "breadcrumbs.txt")
-        breadcrumb_string = ""
-        if os.path.exists(breadcrumb_file_path):
+@lru_cache(maxsize=None)
+def get_template_environment():
+    """Create the Jinja2 environment once and reuse it for every page rendered."""
+    env = Environment(
+        loader=FileSystemLoader('templates'),
+        autoescape=True, # Keep autoescape True for security
+        trim_blocks=True,
+        lstrip_blocks=True,
+        auto_reload=False # Templates don't change mid-run, skip the stat() on every lookup
+    )
+
+    # Add custom filters
+    env.filters['process_bold'] = process_bold_text
+
+    # Register generate_tree_preview_text as a global function (still useful if template calls it)
+    env.globals['generate_tree_preview_text'] = generate_tree_preview_text
+    env.globals['enumerate'] = enumerate  # Make enumerate available in templates
+
+    return env
+
+def get_page_template():
+    """Return the compiled page template, cached by the environment after the first load."""
+    return get_template_environment().get_template('page-template.html')
+
+def assemble_page(files_dir_path, output_dir):
+    """Render the page for one flow directory and return the path of the written HTML file."""
+    # Load all flow JSON files (JSON files are directly inside files_dir_path)
+    flow_data = read_flow_files(files_dir_path)
+    metadata_raw = flow_data['metadata']
+    tree_data = flow_data['tree']
+    timeline_data = flow_data['timeline']
+    challenges_data = flow_data['challenges']
+    adoption_data = flow_data['adoption']
+    implementation_data = flow_data['implementation']
+    roi_data = flow_data['roi']
+    future_tech_data = flow_data['future_tech']
+    specs_data = flow_data['specs']
+
+    # --- Read Breadcrumbs File ---
+    breadcrumb_file_path = os.path.join(files_dir_path, "breadcrumbs.txt")
+    breadcrumb_string = ""
+    if os.path.exists(breadcrumb_file_path):
+        try:
+            with open(breadcrumb_file_path, 'r', encoding='utf-8') as bf:
+                breadcrumb_string = bf.read().strip()
+        except Exception as bc_err:
+            print(f"Warning: Could not read breadcrumbs file {breadcrumb_file_path}: {bc_err}", file=sys.stderr)
+    else:
+         print(f"Warning: Breadcrumbs file not found at {breadcrumb_file_path}", file=sys.stderr)
+
+    # Load alternative approaches if they exist
+    alt_trees_data = []
+    if os.path.exists(files_dir_path): # Check if files_dir_path exists
+        # One directory scan; entry types come from the scan itself, no per-file stat
+        with os.scandir(files_dir_path) as entries:
+            alt_filenames = sorted(
+                (entry.name for entry in entries
+                 if entry.name.startswith('alt') and entry.name.endswith('.json') and entry.is_file()),
+                key=alt_file_sort_key
+            )
+        # Reads are independent and I/O-bound; overlap them, then process in file order
+        with ThreadPoolExecutor(max_workers=min(16, len(alt_filenames) or 1)) as executor:
+            alt_futures = [
+                (filename, executor.submit(read_json_file, os.path.join(files_dir_path, filename)))
+                for filename in alt_filenames
+            ]
+        for filename, alt_future in alt_futures:
             try:
-                with open(breadcrumb_file_path, 'r', encoding='utf-8') as bf:
-                    breadcrumb_string = bf.read().strip()
-            except Exception as bc_err:
-                print(f"Warning: Could not read breadcrumbs file {breadcrumb_file_path}: {bc_err}", file=sys.stderr)
-        else:
-             print(f"Warning: Breadcrumbs file not found at {breadcrumb_file_path}", file=sys.stderr)
-
-        # Load alternative approaches if they exist
-        alt_trees_data = []
-        if os.path.exists(files_dir_path): # Check if files_dir_path exists
-            for filename in os.listdir(files_dir_path): # Iterate through files_dir_path
-                if filename.startswith('alt') and filename.endswith('.json'):
-                    try:
-                        alt_tree = read_json_file(os.path.join(files_dir_path, filename))
-                        # Add preview text directly to each alternative tree dictionary
-                        if isinstance(alt_tree, dict) and 'tree' in alt_tree:
-                             alt_tree['preview_text'] = generate_tree_preview_text(alt_tree)
-                             # Add other potential fields needed by template card, e.g., title, creator
-                             alt_tree.setdefault('title', alt_tree.get('tree', {}).get('step', 'Alternative Approach'))
-                             alt_tree.setdefault('creator', 'Iterative AI') # Example default
-                             alt_tree.setdefault('votes', 0) # Example default
-                             alt_trees_data.append(alt_tree)
-                        else:
-                             print(f"Warning: Skipping invalid alternative file {filename}", file=sys.stderr)
-                    except Exception as alt_err:
-                        print(f"Warning: Could not load or process alternative file {filename}: {alt_err}", file=sys.stderr)
-
-
-        # Set up Jinja2 environment
-        env = Environment(
-            loader=FileSystemLoader('templates'),
-            autoescape=True, # Keep autoescape True for security
-            trim_blocks=True,
-            lstrip_blocks=True
+                alt_tree = alt_future.result()
+                # Add preview text directly to each alternative tree dictionary
+                if isinstance(alt_tree, dict) and 'tree' in alt_tree:
+                     alt_tree = dict(alt_tree) # Copy so the cached parse isn't modified
+                     alt_tree['preview_text'] = generate_tree_preview_text(alt_tree)
+                     # Add other potential fields needed by template card, e.g., title, creator
+                     alt_tree.setdefault('title', alt_tree.get('tree', {}).get('step', 'Alternative Approach'))
+                     alt_tree.setdefault('creator', 'Iterative AI') # Example default
+                     alt_tree.setdefault('votes', 0) # Example default
+                     alt_trees_data.append(alt_tree)
+                else:
+                     print(f"Warning: Skipping invalid alternative file {filename}", file=sys.stderr)
+            except Exception as alt_err:
+                print(f"Warning: Could not load or process alternative file {filename}: {alt_err}", file=sys.stderr)
+
+
+    # Load template (compiled once per process and reused for every page)
+    template = get_page_template()
+
+    # Process data before adding to context (pass breadcrumb string)
+    processed_metadata = process_metadata(metadata_raw, breadcrumb_string)
+    # Now process the breadcrumbs string stored within processed_metadata
+    processed_breadcrumbs = process_breadcrumbs(processed_metadata.get('breadcrumbs', ''))
+
+    # --- Process Timeline Data ---
+    timeline_entries = []
+    timeline_content = timeline_data.get('timeline', {})
+    # Historical entries first, then predictions, each in source order
+    for section, is_prediction in (('historical', False), ('predictions', True)):
+        timeline_entries.extend(
+            {'year': year, 'content': content, 'is_prediction': is_prediction}
+            for year, content in timeline_content.get(section, {}).items()
         )
+    # Sort entries (optional, depends on desired order)
+    # timeline_entries.sort(key=lambda x: x['year']) # Simple sort might fail with year ranges
+
+    # --- Process Adoption Data ---
+    adoption_content = adoption_data.get('automation_adoption', {})
+    # Walk the phase keys in their known order instead of sorting on every page
+    adoption_stages = [adoption_content[phase_key] for phase_key in ADOPTION_PHASE_KEYS if phase_key in adoption_content]
+
+    # --- Process ROI Data ---
+    roi_points = []
+    roi_analysis = roi_data.get('roi_analysis', {})
+    roi_scales_data = roi_analysis.get('roi_analysis', {})
+    for scale_key in ROI_SCALES:
+        scale_data = roi_scales_data.get(scale_key)
+        if isinstance(scale_data, dict) and 'timeframe' in scale_data:
+             roi_points.append({'scale': scale_key, 'timeframe': scale_data['timeframe']})
+    key_benefits_list = roi_analysis.get('key_benefits', [])
+
+    # --- Process Future Technology Data ---
+    future_technologies = []
+    future_tech_content = future_tech_data.get('future_technology', {})
+    for category_key, category_name in FUTURE_TECH_CATEGORIES:
+        for tech_item in future_tech_content.get(category_key, []):
+            if isinstance(tech_item, dict):
+                # Add category for template grouping (on a copy, the parse is cached)
+                future_technologies.append({**tech_item, 'category': category_name})
+
+    # --- Prepare context with processed and structured data ---
+    context = {
+        # Use processed metadata
+        'metadata': processed_metadata,
+        # Main process tree
+        'tree': tree_data.get('tree', {}),
+        # Use processed lists/data
+        'timeline_entries': timeline_entries,
+        'challenge_points': challenges_data.get('challenges', {}).get('challenges', []), # Use 'challenges' list
+        'adoption_stages': adoption_stages,
+        'implementation_levels': implementation_data.get('implementation_assessment', {}).get('process_steps', []), # Use 'process_steps' list
+        'roi_points': roi_points,
+        'key_benefits': key_benefits_list,
+        'future_technologies': future_technologies,
+        # Use correct keys for specifications
+        'spec_performance': specs_data.get('industrial_specifications', {}).get('performance_metrics', []),
+        'spec_requirements': specs_data.get('industrial_specifications', {}).get('implementation_requirements', []),
+        # Use processed breadcrumbs
+        'breadcrumbs': processed_breadcrumbs,
+        # Pass alternatives with pre-generated preview text
+        'alternatives': alt_trees_data
+    }
+
+    # Write output
+    # Generate slug from processed metadata title
+    slug = processed_metadata.get('slug')
+    if slug is None:
+        # Only derive the slug from the title when metadata doesn't supply one
+        slug = processed_metadata.get('title', 'output').lower().replace(' ', '-')
+    # Ensure slug is filesystem-safe (basic example)
+    slug = "".join(c for c in slug if c.isalnum() or c in ('-', '_')).rstrip() or "output"
+    output_path = Path(output_dir) / f"{slug}.html"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Stream the rendered template straight to disk instead of building the whole page string.
+    # Chunks go to a temp file first so a failed render never leaves a truncated page behind.
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    stream = template.stream(context)
+    stream.enable_buffering(size=64)
+    try:
+        # 1 MiB buffer so the streamed chunks reach the OS in a few large writes
+        with open(tmp_path, 'wb', buffering=1 << 20) as output_file:
+            stream.dump(output_file, encoding='utf-8')
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, output_path)
+
+    return output_path
+
+def print_assemble_error(error):
+    """Report an error raised while assembling a page."""
+    if isinstance(error, FileNotFoundError):
+        print(f"Error: Input file not found - {error}", file=sys.stderr)
+    elif isinstance(error, json.JSONDecodeError):
+        print(f"Error: Failed to decode JSON - {error}", file=sys.stderr)
+    else:
+        print(f"An unexpected error occurred: {str(error)}", file=sys.stderr)
+        import traceback
+        traceback.print_exception(error, file=sys.stderr)
 
-        # Add custom filters
-        env.filters['process_bold'] = process_bold_text
-
-        # Register generate_tree_preview_text as a global function (still useful if template calls it)
-        env.globals['generate_tree_preview_text'] = generate_tree_preview_text
-        env.globals['enumerate'] = enumerate  # Make enumerate available in templates
-
-        # Load template
-        template = env.get_template('page-template.html')
-
-        # Process data before adding to context (pass breadcrumb string)
-        processed_metadata = process_metadata(metadata_raw, breadcrumb_string)
-        # Now process the breadcrumbs string stored within processed_metadata
-        processed_breadcrumbs = process_breadcrumbs(processed_metadata.get('breadcrumbs', ''))
-
-        # --- Process Timeline Data ---
-        timeline_entries = []
-        timeline_content = timeline_data.get('timeline', {})
-        for year, content in timeline_content.get('historical', {}).items():
-            timeline_entries.append({'year': year, 'content': content, 'is_prediction': False})
-        for year, content in timeline_content.get('predictions', {}).items():
-            timeline_entries.append({'year': year, 'content': content, 'is_prediction': True})
-        # Sort entries (optional, depends on desired order)
-        # timeline_entries.sort(key=lambda x: x['year']) # Simple sort might fail with year ranges
-
-        # --- Process Adoption Data ---
-        adoption_stages = []
-        adoption_content = adoption_data.get('automation_adoption', {})
-        # Sort by phase key (phase1, phase2, ...) if needed
-        for phase_key in sorted(adoption_content.keys()):
-            if phase_key.startswith('phase'):
-                adoption_stages.append(adoption_content[phase_key])
-
-        # --- Process ROI Data ---
-        roi_points = []
-        roi_scales_data = roi_data.get('roi_analysis', {}).get('roi_analysis', {})
-        for scale_key, scale_data in roi_scales_data.items():
-            if isinstance(scale_data, dict) and 'timeframe' in scale_data:
-                 roi_points.append({'scale': scale_key, 'timeframe': scale_data['timeframe']})
-        key_benefits_list = roi_data.get('roi_analysis', {}).get('key_benefits', [])
-
-        # --- Process Future Technology Data ---
-        future_technologies = []
-        future_tech_content = future_tech_data.get('future_technology', {})
-        categories = {
-            'sensory_systems': 'Sensory Systems',
-            'control_systems': 'Control Systems',
-            'mechanical_systems': 'Mechanical Systems',
-            'software_integration': 'Software Integration'
-        }
-        for category_key, category_name in categories.items():
-            for tech_item in future_tech_content.get(category_key, []):
-                if isinstance(tech_item, dict):
-                    tech_item['category'] = category_name # Add category for template grouping
-                    future_technologies.append(tech_item)
-
-        # --- Prepare context with processed and structured data ---
-        context = {
-            # Use processed metadata
-            'metadata': processed_metadata,
-            # Main process tree
-            'tree': tree_data.get('tree', {}),
-            # Use processed lists/data
-            'timeline_entries': timeline_entries,
-            'challenge_points': challenges_data.get('challenges', {}).get('challenges', []), # Use 'challenges' list
-            'adoption_stages': adoption_stages,
-            'implementation_levels': implementation_data.get('implementation_assessment', {}).get('process_steps', []), # Use 'process_steps' list
-            'roi_points': roi_points,
-            'key_benefits': key_benefits_list,
-            'future_technologies': future_technologies,
-            # Use correct keys for specifications
-            'spec_performance': specs_data.get('industrial_specifications', {}).get('performance_metrics', []),
-            'spec_requirements': specs_data.get('industrial_specifications', {}).get('implementation_requirements', []),
-            # Use processed breadcrumbs
-            'breadcrumbs': processed_breadcrumbs,
-            # Pass alternatives with pre-generated preview text
-            'alternatives': alt_trees_data
-        }
-
-        # Render template
-        output_html = template.render(context)
-
-        # Write output
-        # Generate slug from processed metadata title
-        slug = processed_metadata.get('slug', processed_metadata.get('title', 'output').lower().replace(' ', '-'))
-        # Ensure slug is filesystem-safe (basic example)
-        slug = "".join(c for c in slug if c.isalnum() or c in ('-', '_')).rstrip() or "output"
-        output_path = Path(output_dir) / f"{slug}.html"
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+def main():
+    # Script name + at least one files_dir + output_dir
+    if len(sys.argv) < 3:
+        print("Usage: python assemble.py <files_dir> [<files_dir> ...] <output_dir>")
+        sys.exit(1)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(output_html)
+    files_dir_paths = sys.argv[1:-1] # Flow directory paths, e.g., flow/ce6c090c...
+    output_dir = sys.argv[-1]
 
+    if len(files_dir_paths) == 1:
+        # Single page: render in this process, no pool startup cost
+        try:
+            output_path = assemble_page(files_dir_paths[0], output_dir)
+        except Exception as e:
+            print_assemble_error(e)
+            sys.exit(1)
         print(f"Generated HTML page: {output_path}")
-
-    except FileNotFoundError as fnf_error:
-         print(f"Error: Input file not found - {fnf_error}", file=sys.stderr)
-         sys.exit(1)
-    except json.JSONDecodeError as json_error:
-         print(f"Error: Failed to decode JSON - {json_error}", file=sys.stderr)
-         sys.exit(1)
-    except Exception as e:
-        print(f"An unexpected error occurred: {str(e)}", file=sys.stderr)
-        import traceback
-        traceback.print_exc(file=sys.stderr)
+        return
+
+    # Several pages: rendering is CPU-bound Python, so spread it across processes
+    failed = 0
+    max_workers = min(len(files_dir_paths), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(assemble_page, files_dir_path, output_dir): files_dir_path
+                   for files_dir_path in files_dir_paths}
+        for future in as_completed(futures):
+            try:
+                print(f"Generated HTML page: {future.result()}")
+            except Exception as e:
+                print(f"Failed to assemble {futures[future]}:", file=sys.stderr)
+                print_assemble_error(e)
+                failed += 1
+
+    if failed:
+        print(f"{failed} of {len(files_dir_paths)} pages failed", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,10 @@
 import json
 import sys
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
     create_output_metadata, get_output_filepath, handle_command_args,
-    saveToFile
+    saveToFile, AUTOMATION_SYSTEM_PREFIX
 )
 
 flowUUID = None # Global variable for flow UUID
@@ -17,8 +17,8 @@ def generate_automation_adoption(input_data, save_inputs=False):
     parameters = input_data.get("parameters", {})
 
     # Generate automation adoption phases using LLM
-    systemMsg = (
-        "You are an AI assistant specialized in analyzing automation adoption patterns. "
+    systemMsg = AUTOMATION_SYSTEM_PREFIX + (
+        "This part covers automation adoption patterns. "
         "Your task is to identify and explain the different phases of automation adoption "
         "in a specific field or topic, from basic mechanical assistance to full end-to-end automation."
     )
@@ -65,22 +65,19 @@ def generate_automation_adoption(input_data, save_inputs=False):
         return None
 
 
-def main():
-    """Main function to run the automation adoption generation function."""
+def run(input_data, specified_output_filepath=None, save_inputs=False, flow_uuid=None):
+    """Run the automation adoption generation on already-loaded input data. Returns the output path, or None on failure."""
     global flowUUID
-    usage_msg = "Usage: python automation-adoption.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
-    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
-    flowUUID = flow_uuid_arg # Set the global variable
+    flowUUID = flow_uuid # Set the global variable
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
-    input_data = load_json(input_filepath)
     adoption_phases = generate_automation_adoption(input_data, save_inputs)
 
     if adoption_phases is None:
         print("Failed to generate automation adoption phases.")
-        sys.exit(1)
+        return None
 
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -99,7 +96,16 @@ def main():
 
     save_output(output_data, output_filepath)
     print(f"Generated automation adoption phases, output saved to {output_filepath}")
+    return output_filepath
 
+def main():
+    """Main function to run the automation adoption generation function."""
+    usage_msg = "Usage: python automation-adoption.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
+
+    input_data = load_json(input_filepath)
+    if run(input_data, specified_output_filepath, save_inputs, flow_uuid_arg) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,31 +1,25 @@
-import json
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm,
-    create_output_metadata, get_output_filepath, handle_command_args
+    create_output_metadata, get_output_filepath, handle_command_args,
+    build_conversion_prompt
 )
 
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+BASIC_ENGLISH_SYSTEM_MSG = ("Convert the given text into BASIC English. "
+                            "Use only words from the BASIC English list (850 words). "
+                            "Make all sentences short, clear, and simple. Do not use difficult words. "
+                            "If needed, explain with easy words. Keep numbers and measurements clear. "
+                            "If the sentence is already simple, do not change it.")
+
 def translate_basic_english(input_data):
     """Convert the input text to BASIC English."""
-    prompt = f"""
-    {" ".join(input_data.get("input_text", []))}
-    Output Format: {input_data["output_format"]}
-    """
-
-    if "success_criteria" in input_data:
-        criteria_str = json.dumps(input_data["success_criteria"], indent=2)
-        prompt += f"\n\nSuccess Criteria:\n{criteria_str}"
-
-    systemMsg = ("Convert the given text into BASIC English. "
-                 "Use only words from the BASIC English list (850 words). "
-                 "Make all sentences short, clear, and simple. Do not use difficult words. "
-                 "If needed, explain with easy words. Keep numbers and measurements clear. "
-                 "If the sentence is already simple, do not change it.")
+    prompt = build_conversion_prompt(input_data)
 
     # Use chat_with_llm instead of direct ollama.chat call
     response_content = chat_with_llm(
         model=input_data["model"],
-        system_message=systemMsg,
+        system_message=BASIC_ENGLISH_SYSTEM_MSG,
         user_message=prompt,
         parameters=input_data.get("parameters", {})
     )
@@ -35,10 +29,10 @@ def translate_basic_english(input_data):
 def main():
     """Main function to run the BASIC English convert routine."""
     usage_msg = "Usage: python basic-english.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     input_data = load_json(input_filepath)
     output_content = translate_basic_english(input_data)
@@ -55,7 +49,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "output_text": output_content.split("\n")
+        "output_text": output_content.splitlines()
     }
 
     save_output(output_data, output_filepath)
@@ -3,19 +3,61 @@ import sys
 import os
 import re
 import uuid
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
-    create_output_metadata, get_output_filepath, translate_to_basic_english
+    create_output_metadata, get_output_filepath, translate_to_basic_english,
+    json_dumps
 )
 
+use_llm_cache = True # Global toggle, cleared by --no-cache
+stream_llm_output = False # Global toggle, set by --stream
+
+# Characters dropped from directory names, and runs of spaces/hyphens turned into one underscore
+INVALID_FILENAME_CHARS_RE = re.compile(r'[^\w\s-]')
+FILENAME_SEPARATOR_RE = re.compile(r'[\s-]+')
+# Same deletions as INVALID_FILENAME_CHARS_RE for ASCII names (most step names), done by str.translate in one C pass
+ASCII_INVALID_FILENAME_CHARS = str.maketrans("", "", "".join(
+    chr(code) for code in range(128) if INVALID_FILENAME_CHARS_RE.match(chr(code))
+))
+# A node specifier made of only digits and dashes is a path of child indices, not a UUID
+PATH_SPECIFIER_RE = re.compile(r'^[\d-]+$')
+
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+EXPAND_NODE_SYSTEM_MSG = (
+    "You are an AI that breaks down tasks into detailed steps. "
+    "For the given task, generate a set of specific, actionable substeps needed to complete it. "
+    "Maintain clarity and logical order. "
+    "Format your response as a valid JSON array of step objects, where each object has a 'step' field. "
+    "Example format: [{'step': 'First detailed step'}, {'step': 'Second detailed step'}] "
+    "Your entire response must be parseable as JSON. Do not include markdown formatting or commentary."
+)
+
+# Used when several nodes are expanded in one request
+EXPAND_NODES_BATCH_SYSTEM_MSG = (
+    "You are an AI that breaks down tasks into detailed steps. "
+    "For each given task, generate a set of specific, actionable substeps needed to complete it. "
+    "Maintain clarity and logical order. "
+    "Format your response as a valid JSON object that maps each task id to a JSON array of step objects, "
+    "where each object has a 'step' field. "
+    "Example format: {\"0\": [{\"step\": \"First detailed step\"}], \"1\": [{\"step\": \"First detailed step\"}]} "
+    "Your entire response must be parseable as JSON. Do not include markdown formatting or commentary."
+)
+
+def print_llm_chunk(piece):
+    """Echo streamed model output as it arrives."""
+    print(piece, end="", flush=True)
+
 def sanitize_filename(name):
     """Convert a step name to a valid directory name using lowercase and underscores."""
     # Convert to lowercase
     sanitized = name.lower()
     # Remove invalid characters and replace spaces/hyphens with underscores
-    sanitized = re.sub(r'[^\w\s-]', '', sanitized)
-    sanitized = re.sub(r'[\s-]+', '_', sanitized)
+    if sanitized.isascii():
+        sanitized = sanitized.translate(ASCII_INVALID_FILENAME_CHARS)
+    else:
+        sanitized = INVALID_FILENAME_CHARS_RE.sub('', sanitized)
+    sanitized = FILENAME_SEPARATOR_RE.sub('_', sanitized)
     # Ensure it's not too long
     return sanitized[:40]  # Shortened to leave room for the UUID
 
@@ -26,8 +68,7 @@ def find_node_by_path(base_dir, path_indices):
         node_path = os.path.join(base_dir, "node.json")
         if os.path.exists(node_path):
             try:
-                with open(node_path, 'r') as f:
-                    return json.load(f), base_dir
+                return load_json(node_path), base_dir
             except json.JSONDecodeError:
                 return None, None
         return None, None
@@ -37,13 +78,12 @@ def find_node_by_path(base_dir, path_indices):
     
     # Navigate through subdirectories based on index
     for index in path_indices:
-        # Get all subdirectories (only directories, not files)
-        subdirs = [d for d in os.listdir(current_dir) 
-                   if os.path.isdir(os.path.join(current_dir, d)) 
-                   and d != "." and d != ".." and not d.startswith('.')]
+        # Get all subdirectories (only directories, not files); scandir gives the type without a stat per entry
+        with os.scandir(current_dir) as entries:
+            subdirs = sorted(entry.name for entry in entries
+                             if not entry.name.startswith('.') and entry.is_dir())
         
-        # Sort subdirectories alphabetically for consistent indexing
-        subdirs.sort()
+        # Subdirectories are sorted alphabetically for consistent indexing
         
         if index < 0 or index >= len(subdirs):
             print(f"Path index {index} is out of range. Available range: 0-{len(subdirs)-1}")
@@ -56,8 +96,7 @@ def find_node_by_path(base_dir, path_indices):
     node_path = os.path.join(current_dir, "node.json")
     if os.path.exists(node_path):
         try:
-            with open(node_path, 'r') as f:
-                return json.load(f), current_dir
+            return load_json(node_path), current_dir
         except json.JSONDecodeError:
             return None, None
     
@@ -71,10 +110,9 @@ def find_node_by_uuid(search_uuid, base_dir):
         if "node.json" in files:
             node_path = os.path.join(root, "node.json")
             try:
-                with open(node_path, 'r') as f:
-                    node_data = json.load(f)
-                    if node_data.get("uuid", "").lower() == search_uuid:
-                        return node_data, root
+                node_data = load_json(node_path)
+                if node_data.get("uuid", "").lower() == search_uuid:
+                    return node_data, root
             except json.JSONDecodeError:
                 continue
     
@@ -94,22 +132,17 @@ def expand_node_in_filesystem(node_data, node_dir, model, parameters=None, num_s
     # Allow customizing the number of substeps
     substep_range = "3-7" if num_substeps is None else str(num_substeps)
     
-    system_msg = (
-        "You are an AI that breaks down tasks into detailed steps. "
-        "For the given task, generate a set of specific, actionable substeps needed to complete it. "
-        "Maintain clarity and logical order. "
-        "Format your response as a valid JSON array of step objects, where each object has a 'step' field. "
-        "Example format: [{'step': 'First detailed step'}, {'step': 'Second detailed step'}] "
-        "Your entire response must be parseable as JSON. Do not include markdown formatting or commentary."
-    )
-    
     user_msg = (
         f"Break down the following task into {substep_range} detailed substeps:\n\n"
         f"Task: {step}\n\n"
         "Return ONLY a JSON array of step objects, with no markdown formatting, code blocks, or extra text."
     )
     
-    response_text = chat_with_llm(model, system_msg, user_msg, parameters)
+    response_text = chat_with_llm(model, EXPAND_NODE_SYSTEM_MSG, user_msg, parameters,
+                                  cache_namespace="expand-node" if use_llm_cache else None,
+                                  on_chunk=print_llm_chunk if stream_llm_output else None)
+    if stream_llm_output:
+        print()
     
     # Parse the LLM response
     substeps = parse_llm_json_response(response_text)
@@ -118,6 +151,10 @@ def expand_node_in_filesystem(node_data, node_dir, model, parameters=None, num_s
         print("Error: No valid substeps could be generated")
         return []
     
+    return create_substep_dirs(substeps, node_dir, node_uuid, model, parameters)
+
+def create_substep_dirs(substeps, node_dir, node_uuid, model, parameters):
+    """Create a child directory with node.json for each substep under node_dir."""
     # Create subdirectories for each substep
     created_dirs = []
     for substep in substeps:
@@ -127,7 +164,7 @@ def expand_node_in_filesystem(node_data, node_dir, model, parameters=None, num_s
         substep_uuid = str(uuid.uuid4())
         
         # Translate step text to Basic English
-        basic_english_step = translate_to_basic_english(substep_text, model, parameters)
+        basic_english_step = translate_to_basic_english(substep_text, model, parameters, use_cache=use_llm_cache)
         
         # Create directory name from Basic English version
         substep_name = sanitize_filename(basic_english_step)
@@ -148,8 +185,8 @@ def expand_node_in_filesystem(node_data, node_dir, model, parameters=None, num_s
             "parent_uuid": node_uuid
         }
         
-        with open(os.path.join(substep_dir, "node.json"), "w") as f:
-            json.dump(substep_data, f, indent=4)
+        with open(os.path.join(substep_dir, "node.json"), "wb") as f:
+            f.write(json_dumps(substep_data, pretty=False))
         
         created_dirs.append({
             "directory": substep_dir,
@@ -158,6 +195,47 @@ def expand_node_in_filesystem(node_data, node_dir, model, parameters=None, num_s
     
     return created_dirs
 
+def expand_nodes_in_filesystem(targets, model, parameters=None, num_substeps=None):
+    """Expand several (node_data, node_dir) targets with one LLM request, falling back per node."""
+    if parameters is None:
+        parameters = {}
+    
+    print(f"Expanding {len(targets)} nodes in one request")
+    
+    substep_range = "3-7" if num_substeps is None else str(num_substeps)
+    
+    tasks = [{"id": str(i), "step": node_data.get("step", "Unknown step")}
+             for i, (node_data, _) in enumerate(targets)]
+    user_msg = (
+        f"Break down each of the following tasks into {substep_range} detailed substeps:\n\n"
+        f"{json.dumps({'tasks': tasks}, ensure_ascii=False)}\n\n"
+        "Return ONLY a JSON object keyed by task id, with no markdown formatting, code blocks, or extra text."
+    )
+    
+    response_text = chat_with_llm(model, EXPAND_NODES_BATCH_SYSTEM_MSG, user_msg, parameters,
+                                  cache_namespace="expand-node" if use_llm_cache else None,
+                                  on_chunk=print_llm_chunk if stream_llm_output else None)
+    if stream_llm_output:
+        print()
+    substeps_by_id = parse_llm_json_response(response_text)
+    if not isinstance(substeps_by_id, dict):
+        substeps_by_id = {}
+    
+    results = []
+    for task, (node_data, node_dir) in zip(tasks, targets):
+        substeps = substeps_by_id.get(task["id"])
+        if not isinstance(substeps, list) or len(substeps) == 0:
+            # Model skipped or mangled this task; expand it on its own
+            print(f"No substeps for '{task['step']}' in batched response, expanding separately")
+            results.append(expand_node_in_filesystem(node_data, node_dir, model, parameters, num_substeps))
+            continue
+        
+        print(f"Expanding node: '{task['step']}'")
+        node_uuid = node_data.get("uuid", str(uuid.uuid4()))
+        results.append(create_substep_dirs(substeps, node_dir, node_uuid, model, parameters))
+    
+    return results
+
 def parse_path_string(path_str):
     """Convert a path string like '1-0-2' or '4' to a list of integers [1, 0, 2] or [4]."""
     try:
@@ -171,18 +249,34 @@ def parse_path_string(path_str):
 
 def handle_expand_node_args():
     """Custom argument handling for expand-node.py to support node path specification."""
-    usage_msg = """Usage: python expand-node.py <input_directory> [node_path_or_uuid] [output_metadata_path]
+    usage_msg = """Usage: python expand-node.py <input_directory> [node_path_or_uuid] [output_metadata_path] [--no-cache] [--stream]
     
     <input_directory>: Directory containing the tree structure (e.g., output/hallucinate-tree/uuid)
-    [node_path_or_uuid]: Optional - Path indices (e.g., 1-0-2) or UUID to identify the node to expand
+    [node_path_or_uuid]: Optional - Path indices (e.g., 1-0-2) or UUID to identify the node to expand.
+                         Separate several with commas (e.g., 1-0,1-1,1-2) to expand them in one LLM request.
     [output_metadata_path]: Optional - Path to save expansion metadata
+    --no-cache: Always query the model instead of reusing cached responses from .cache/
+    --stream: Print the model's output as it is generated
     
     Examples:
       python expand-node.py output/hallucinate-tree/e2dd9b38-ab19-4156-8031-bcb2db5c93a7
       python expand-node.py output/hallucinate-tree/e2dd9b38-ab19-4156-8031-bcb2db5c93a7 1-0
       python expand-node.py output/hallucinate-tree/e2dd9b38-ab19-4156-8031-bcb2db5c93a7 e2dd9b38
+      python expand-node.py output/hallucinate-tree/e2dd9b38-ab19-4156-8031-bcb2db5c93a7 1-0,1-1
     """
     
+    # Check for --no-cache flag
+    global use_llm_cache
+    if "--no-cache" in sys.argv:
+        use_llm_cache = False
+        sys.argv.remove("--no-cache")
+    
+    # Check for --stream flag
+    global stream_llm_output
+    if "--stream" in sys.argv:
+        stream_llm_output = True
+        sys.argv.remove("--stream")
+    
     if len(sys.argv) < 2 or len(sys.argv) > 4:
         print(usage_msg)
         sys.exit(1)
@@ -211,7 +305,7 @@ def main():
     input_directory, node_specifier, specified_output_filepath = handle_expand_node_args()
     
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     # Check if the input directory exists
     if not os.path.isdir(input_directory):
@@ -225,45 +319,44 @@ def main():
     
     if os.path.exists(metadata_path):
         try:
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-                if "model" in metadata:
-                    model = metadata["model"]
-                if "parameters" in metadata:
-                    parameters = metadata["parameters"]
+            metadata = load_json(metadata_path)
+            if "model" in metadata:
+                model = metadata["model"]
+            if "parameters" in metadata:
+                parameters = metadata["parameters"]
         except json.JSONDecodeError:
             print("Warning: Could not parse metadata.json, using default model settings.")
     
-    # Find the target node
-    target_node = None
-    node_dir = None
-    
-    if node_specifier:
-        # Check if the specifier is a path (contains only digits and dashes)
-        if re.match(r'^[\d-]+$', node_specifier):
-            path_indices = parse_path_string(node_specifier)
-            print(f"Searching for node at path indices: {path_indices}")
-            target_node, node_dir = find_node_by_path(input_directory, path_indices)
+    # Find the target node(s); several specifiers are separated by commas
+    specifiers = [spec.strip() for spec in node_specifier.split(',') if spec.strip()] if node_specifier else [None]
+    targets = []
+    
+    for specifier in specifiers:
+        if specifier:
+            # Check if the specifier is a path (contains only digits and dashes)
+            if PATH_SPECIFIER_RE.match(specifier):
+                path_indices = parse_path_string(specifier)
+                print(f"Searching for node at path indices: {path_indices}")
+                target_node, node_dir = find_node_by_path(input_directory, path_indices)
+            else:
+                # Assume it's a UUID or part of one
+                print(f"Searching for node with UUID containing: {specifier}")
+                target_node, node_dir = find_node_by_uuid(specifier, input_directory)
         else:
-            # Assume it's a UUID or part of one
-            print(f"Searching for node with UUID containing: {node_specifier}")
-            target_node, node_dir = find_node_by_uuid(node_specifier, input_directory)
+            # Default to root node
+            print("No node specified, using root node.")
+            target_node, node_dir = find_node_by_path(input_directory, [])
+        
+        if target_node is None or node_dir is None:
+            print(f"Error: Could not find the specified node{f' {specifier}' if specifier else ''}.")
+            sys.exit(1)
+        targets.append((target_node, node_dir))
+    
+    # Expand the node(s); siblings share a single LLM request
+    if len(targets) == 1:
+        expanded_per_target = [expand_node_in_filesystem(targets[0][0], targets[0][1], model, parameters)]
     else:
-        # Default to root node
-        print("No node specified, using root node.")
-        target_node, node_dir = find_node_by_path(input_directory, [])
-    
-    if target_node is None or node_dir is None:
-        print(f"Error: Could not find the specified node.")
-        sys.exit(1)
-    
-    # Expand the node
-    expanded_dirs = expand_node_in_filesystem(
-        target_node,
-        node_dir,
-        model,
-        parameters
-    )
+        expanded_per_target = expand_nodes_in_filesystem(targets, model, parameters)
     
     # Get output filepath and UUID for metadata
     output_filepath, output_uuid = get_output_filepath(
@@ -275,28 +368,37 @@ def main():
     metadata = create_output_metadata("Node Expansion", start_time, output_uuid)
     
     # Add details about the expansion to metadata
-    expanded_node_info = []
-    for dir_info in expanded_dirs:
-        expanded_node_info.append({
-            "step": dir_info["data"]["step"],
-            "uuid": dir_info["data"]["uuid"],
-            "directory": dir_info["directory"]
+    expansions = []
+    for (target_node, node_dir), expanded_dirs in zip(targets, expanded_per_target):
+        expanded_node_info = []
+        for dir_info in expanded_dirs:
+            expanded_node_info.append({
+                "step": dir_info["data"]["step"],
+                "uuid": dir_info["data"]["uuid"],
+                "directory": dir_info["directory"]
+            })
+        expansions.append({
+            "expanded_node": {
+                "step": target_node["step"],
+                "uuid": target_node["uuid"],
+                "directory": node_dir
+            },
+            "new_nodes": expanded_node_info,
+            "num_substeps_created": len(expanded_dirs)
         })
     
     # Combine metadata with expansion information
-    output_data = {
-        **metadata,
-        "expanded_node": {
-            "step": target_node["step"],
-            "uuid": target_node["uuid"],
-            "directory": node_dir
-        },
-        "new_nodes": expanded_node_info,
-        "num_substeps_created": len(expanded_dirs)
-    }
+    if len(expansions) == 1:
+        output_data = {**metadata, **expansions[0]}
+    else:
+        output_data = {
+            **metadata,
+            "expansions": expansions,
+            "num_substeps_created": sum(e["num_substeps_created"] for e in expansions)
+        }
     
     save_output(output_data, output_filepath)
-    print(f"Node expanded with {len(expanded_dirs)} substeps")
+    print(f"Node expanded with {output_data['num_substeps_created']} substeps")
     print(f"Expansion metadata saved to {output_filepath}")
 
 if __name__ == "__main__":
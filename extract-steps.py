@@ -1,45 +1,48 @@
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
-    create_output_metadata, get_output_filepath, handle_command_args
+    create_output_metadata, get_output_filepath, handle_command_args,
+    cache_namespace_for
 )
 
+# Built once so every call sends a byte-identical system prompt
+EXTRACT_STEPS_SYSTEM_MSG = ("You are an AI assistant specialized in extracting actionable instructions from text. "
+                            "Your task is to take an article, recipe, or guide and distill it into a clear, step-by-step list of instructions. Follow these guidelines: "
+                            "Extract only the necessary steps. Ignore background information, explanations, anecdotes, or unnecessary details. "
+                            "Keep steps concise and clear. Ensure each step is actionable and uses direct language. "
+                            "Maintain logical order. Ensure the steps follow a clear and natural progression. "
+                            "Output the instructions in a simple list format with no numbers, symbols, markdown, or extra formatting. "
+                            "Put each step on its own line. "
+                            "Example Input: To make a great omelet, first, you need to gather your ingredients. People often wonder whether to use water or milk—chefs recommend milk. Crack the eggs into a bowl, whisk them, and add salt and pepper to taste. Then, heat a pan over medium heat and add butter. Once melted, pour in the eggs and let them sit before stirring. Cook until just set, then fold the omelet and serve immediately. "
+                            "Example Output: \n"
+                            "Crack eggs into a bowl and whisk.\n"
+                            "Add salt, pepper, and a splash of milk.\n"
+                            "Heat a pan over medium heat and add butter.\n"
+                            "Pour in eggs and let them sit before stirring.\n"
+                            "Cook until just set, then fold and serve.")
+
+# Everything in the user message before the article
+EXTRACT_STEPS_USER_MSG_HEAD = "ARTICLE:\n"
+
 def extract_step(input_data):
     """Extract steps based on the input text."""
-    # Properly join the article text if it's a list
-    text = " ".join(input_data.get("article_text", []))
+    article_text = input_data.get("article_text", [])
     model = input_data.get("model", "gemma3")
     
-    # Create a clearer prompt with explicit instructions
-    userMsg = f"""Please extract the step-by-step instructions from the following article:
-
-ARTICLE:
-{text}
-
-Remember to:
-1. Extract only necessary, actionable steps
-2. Keep steps concise and clear
-3. Maintain logical order
-4. Present steps in a simple list format without numbers or formatting
-
-Each step should be on its own line, with no numbering.
-"""
-
-    systemMsg = ("You are an AI assistant specialized in extracting actionable instructions from text. "
-                 "Your task is to take an article, recipe, or guide and distill it into a clear, step-by-step list of instructions. Follow these guidelines: "
-                 "Extract only the necessary steps. Ignore background information, explanations, anecdotes, or unnecessary details. "
-                 "Keep steps concise and clear. Ensure each step is actionable and uses direct language. "
-                 "Maintain logical order. Ensure the steps follow a clear and natural progression. "
-                 "Output the instructions in a simple list format with no numbers, symbols, markdown, or extra formatting. "
-                 "Example Input: To make a great omelet, first, you need to gather your ingredients. People often wonder whether to use water or milk—chefs recommend milk. Crack the eggs into a bowl, whisk them, and add salt and pepper to taste. Then, heat a pan over medium heat and add butter. Once melted, pour in the eggs and let them sit before stirring. Cook until just set, then fold the omelet and serve immediately. "
-                 "Example Output: \n"
-                 "Crack eggs into a bowl and whisk.\n"
-                 "Add salt, pepper, and a splash of milk.\n"
-                 "Heat a pan over medium heat and add butter.\n"
-                 "Pour in eggs and let them sit before stirring.\n"
-                 "Cook until just set, then fold and serve.")
+    # Static instructions live in the system message and the article comes last,
+    # so repeated calls share the longest possible prompt prefix
+    if isinstance(article_text, str):
+        # Already one string: use it as-is (joining it would put a space between every character)
+        userMsg = EXTRACT_STEPS_USER_MSG_HEAD + article_text
+    else:
+        # A list of paragraphs is joined with spaces, as before
+        userMsg = EXTRACT_STEPS_USER_MSG_HEAD + " ".join(article_text)
 
-    response_text = chat_with_llm(model, systemMsg, userMsg, input_data.get("parameters", {}))
+    # Deterministic runs reuse the answer for the same or a paraphrased article
+    parameters = input_data.get("parameters", {})
+    response_text = chat_with_llm(model, EXTRACT_STEPS_SYSTEM_MSG, userMsg, parameters,
+                                  cache_namespace=cache_namespace_for("extract-steps", parameters),
+                                  semantic=True)
 
     # Use parse_llm_json_response utility with include_children=False
     steps = parse_llm_json_response(response_text, include_children=False)
@@ -52,10 +55,10 @@ Each step should be on its own line, with no numbering.
 def main():
     """Main function to run the step extraction."""
     usage_msg = "Usage: python extract-steps.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     input_data = load_json(input_filepath)
     steps = extract_step(input_data)
@@ -1,59 +1,123 @@
 import os
 import sys
 import uuid
-import json
-import subprocess
+import traceback
+import importlib.util
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from utils import (
     load_json, save_output, create_output_metadata,
-    get_output_filepath, handle_command_args
+    get_output_filepath, handle_command_args, format_time_taken,
+    apply_input_overrides
 )
 
-def run_program(program_name, input_path, output_path, extra_args=None):
+# Steps 3-9 only read the flow input and write their own output file, so they can run side by side
+CONCURRENT_PROGRAMS = {
+    "generate-automation-timeline.py",
+    "generate-automation-challenges.py",
+    "automation-adoption.py",
+    "current-implementations.py",
+    "return-analysis.py",
+    "future-technology.py",
+    "specifications-industrial.py",
+}
+
+# Ask the user what to do when a step fails; --no-retry-prompt continues past failures instead
+retry_prompt = True
+
+# Step scripts loaded into this process, keyed by file name
+loaded_programs = {}
+
+def load_program(program_name):
+    """Import a step script by file name (they have hyphens, so not via a plain import) once per run."""
+    module = loaded_programs.get(program_name)
+    if module is None:
+        program_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), program_name)
+        module_name = os.path.splitext(program_name)[0].replace("-", "_")
+        spec = importlib.util.spec_from_file_location(module_name, program_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        loaded_programs[program_name] = module
+    return module
+
+def execute_program(program_name, input_data, output_path, run_options=None):
     """
-    Run a program with the specified input and output paths.
-    Returns 'success', 'retry', 'continue', or 'stop' based on execution and user input.
+    Run a step in this process: its run() on the input data, or assemble_page() for assemble.py.
+    Returns (succeeded, report); the report is printed by the caller.
     """
-    print(f"Running {program_name}...")
-    
-    command = [sys.executable, program_name, input_path, output_path]
-    if extra_args:
-        command.extend(extra_args)
-        
     try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        print(f"  {program_name} completed successfully")
-        if result.stdout.strip():
-            print(f"  STDOUT: {result.stdout.strip()}")
-        if result.stderr.strip():
-            print(f"  STDERR: {result.stderr.strip()}")
-        return "success"
-    except subprocess.CalledProcessError as e:
-        print(f"  ERROR running {program_name}: {e}")
-        if e.stdout:
-            print(f"  STDOUT: {e.stdout.strip()}")
-        if e.stderr:
-            print(f"  STDERR: {e.stderr.strip()}")
-        
-        while True:
-            choice = input(f"Program {program_name} failed. Choose action: (c)ontinue, (r)etry, (s)top: ").lower()
-            if choice == 'c':
-                return "continue"
-            elif choice == 'r':
-                return "retry"
-            elif choice == 's':
-                return "stop"
-            else:
-                print("Invalid choice. Please enter 'c', 'r', or 's'.")
+        module = load_program(program_name)
+        if program_name == "assemble.py":
+            # Assemble reads the N.json files the other steps wrote into the flow directory
+            result = module.assemble_page(output_path, output_path)
+        else:
+            result = module.run(input_data, output_path, **(run_options or {}))
+    except (Exception, SystemExit):
+        # Steps still call sys.exit() on some errors, which must not end the whole flow
+        return False, f"  ERROR running {program_name}:\n{traceback.format_exc().rstrip()}"
+    
+    if result is None:
+        return False, f"  ERROR running {program_name}: no output was produced"
+    return True, f"  {program_name} completed successfully"
+
+def ask_failure_action(program_name):
+    """Ask the user how to handle a failed program. Returns 'continue', 'retry', or 'stop'."""
+    if not retry_prompt:
+        # Non-interactive runs keep going and leave the failed step's output missing
+        return "continue"
+    while True:
+        choice = input(f"Program {program_name} failed. Choose action: (c)ontinue, (r)etry, (s)top: ").lower()
+        if choice == 'c':
+            return "continue"
+        elif choice == 'r':
+            return "retry"
+        elif choice == 's':
+            return "stop"
+        else:
+            print("Invalid choice. Please enter 'c', 'r', or 's'.")
+
+def run_program_group(jobs):
+    """
+    Run independent (program, input_data, output_path, run_options) jobs concurrently,
+    then resolve any failures one at a time. Returns False if the user chose to stop.
+    """
+    for job in jobs:
+        print(f"Running {job[0]}...")
+    
+    if len(jobs) == 1:
+        results = [execute_program(*jobs[0])]
+    else:
+        # Each job spends its time waiting on the LLM, so threads are enough to overlap them
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            results = list(executor.map(lambda job: execute_program(*job), jobs))
+    
+    for job, (succeeded, report) in zip(jobs, results):
+        program = job[0]
+        print(report)
+        while not succeeded:
+            action = ask_failure_action(program)
+            if action == "continue":
+                print(f"Warning: {program} failed, but user chose to continue.")
+                break
+            elif action == "stop":
+                print(f"User chose to stop the flow after {program} failed.")
+                return False
+            print(f"User chose to retry {program}.")
+            print(f"Running {program}...")
+            succeeded, report = execute_program(*job)
+            print(report)
+    return True
 
 def main():
     """Main function to run the flow of programs."""
-    usage_msg = "Usage: python flow-maker.py <input_json> [breadcrumbs]"
+    global retry_prompt
+    usage_msg = "Usage: python flow-maker.py <input_json> [breadcrumbs] [--no-retry-prompt]"
+    
+    if "--no-retry-prompt" in sys.argv:
+        sys.argv.remove("--no-retry-prompt")
+        retry_prompt = False
     
     if len(sys.argv) < 2:
         print(usage_msg)
@@ -65,7 +129,7 @@ def main():
     breadcrumbs = sys.argv[2] if len(sys.argv) > 2 else ""
     
     print("Starting flow process...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     # Load the input data
     input_data = load_json(input_filepath)
@@ -74,18 +138,18 @@ def main():
     flow_uuid = str(uuid.uuid4())
     print(f"Flow UUID: {flow_uuid}")
     
-    # Create flow directory
-    flow_dir = os.path.join("flow", flow_uuid)
-    os.makedirs(flow_dir, exist_ok=True)
+    # Create flow directory, with the inputs/ folder the alternative inputs are written to
+    flow_dir = Path("flow") / flow_uuid
+    (flow_dir / "inputs").mkdir(parents=True, exist_ok=True)
     
     # Save a copy of the input file in the flow directory
-    input_copy_path = os.path.join(flow_dir, "input.json")
-    with open(input_copy_path, "w", encoding="utf-8") as f:
-        json.dump(input_data, f, indent=4)
+    input_copy_path = flow_dir / "input.json"
+    # Only read back by the flow, so it is written compact
+    save_output(input_data, input_copy_path, pretty=False)
     
     # Save breadcrumbs to a file in the flow directory
     if breadcrumbs:
-        breadcrumbs_path = os.path.join(flow_dir, "breadcrumbs.txt")
+        breadcrumbs_path = flow_dir / "breadcrumbs.txt"
         with open(breadcrumbs_path, "w", encoding="utf-8") as f:
             f.write(breadcrumbs)
         print(f"Breadcrumbs saved: {breadcrumbs}")
@@ -104,36 +168,34 @@ def main():
         ("assemble.py", None),  # 10. assemble.py - Output filename handled differently
     ]
     
-    # Run each program in sequence
-    program_idx = 0
-    while program_idx < len(programs):
-        program, output_filename = programs[program_idx]
-        print(f"\nStep {program_idx + 1}/{len(programs)}: Running {program}")
-
-        current_input_path = input_copy_path
-        
+    # Build every step's job once up front: (program, input_data, output_path, run_options).
+    # Retries reuse the same job tuple.
+    step_options = {"save_inputs": True, "flow_uuid": flow_uuid}
+    plan = []
+    for program, output_filename in programs:
         if program == "assemble.py":
-            output_path = flow_dir
-            current_input_path = flow_dir
-            extra_args = None
+            plan.append((program, None, str(flow_dir), None))
+        else:
+            # Each step gets its own copy, since steps may add cached keys to their input
+            run_options = {**step_options, "flat_output": True} if program == "hallucinate-tree.py" else step_options
+            plan.append((program, dict(input_data), str(flow_dir / output_filename), run_options))
+    
+    # Group the jobs into stages: consecutive concurrent programs share one stage
+    stages = []
+    for job in plan:
+        if job[0] in CONCURRENT_PROGRAMS and stages and stages[-1][0][0] in CONCURRENT_PROGRAMS:
+            stages[-1].append(job)
         else:
-            output_path = os.path.join(flow_dir, output_filename)
-            extra_args = ["-saveInputs", "-flow_uuid=" + flow_uuid]
-            if program == "hallucinate-tree.py":
-                extra_args += ["-flat"]
+            stages.append([job])
+    
+    # Run each stage in order; programs within a stage run concurrently
+    step_number = 0
+    for jobs in stages:
+        for job in jobs:
+            step_number += 1
+            print(f"\nStep {step_number}/{len(plan)}: Running {job[0]}")
         
-        status = run_program(program, current_input_path, output_path, extra_args)
-
-        if status == "success":
-            program_idx += 1
-        elif status == "continue":
-            print(f"Warning: {program} failed, but user chose to continue.")
-            program_idx += 1
-        elif status == "retry":
-            print(f"User chose to retry {program}.")
-            # The loop will re-run the current program_idx
-        elif status == "stop":
-            print(f"User chose to stop the flow after {program} failed.")
+        if not run_program_group(jobs):
             sys.exit(1)
             
     # Generate alternative trees if specified in the input
@@ -141,95 +203,79 @@ def main():
     if num_alternatives > 0:
         print(f"\nGenerating {num_alternatives} alternative trees...")
         
-        # Create variations of the input with different model parameters for diversity
-        alternative_inputs = []
+        # Different name/title for each approach
+        approaches = [
+            ("Efficiency-Optimized Approach", "This approach prioritizes minimizing resource usage and production time."),
+            ("Safety-Optimized Approach", "This approach focuses on maximizing safety and reliability."),
+            ("Hybridized Approach", "This approach balances efficiency with safety considerations."),
+        ]
+        
+        # Only what differs per alternative is kept; each alternative input is the flow input
+        # with its overrides applied (hallucinate-tree --alt-index/--overrides-file does the same)
+        alternative_overrides = []
         for i in range(num_alternatives):
-            alt_input = input_data.copy()
-            
-            # Modify parameters to create diversity in the alternatives
-            if "parameters" not in alt_input:
-                alt_input["parameters"] = {}
-            
-            # Different temperature for each alternative to produce variations
-            alt_input["parameters"]["temperature"] = 0.3 + (i * 0.15)  # 0.3, 0.45, 0.6, etc.
-            
-            # Different name/title for each approach
-            if i == 0:
-                alt_input["approach_name"] = "Efficiency-Optimized Approach"
-                alt_input["approach_description"] = "This approach prioritizes minimizing resource usage and production time."
-            elif i == 1:
-                alt_input["approach_name"] = "Safety-Optimized Approach"
-                alt_input["approach_description"] = "This approach focuses on maximizing safety and reliability."
-            elif i == 2:
-                alt_input["approach_name"] = "Hybridized Approach"
-                alt_input["approach_description"] = "This approach balances efficiency with safety considerations."
+            if i < len(approaches):
+                approach_name, approach_description = approaches[i]
             else:
-                alt_input["approach_name"] = f"Alternative Approach {i+1}"
-                alt_input["approach_description"] = f"An alternative methodology for approaching this process."
+                approach_name = f"Alternative Approach {i+1}"
+                approach_description = "An alternative methodology for approaching this process."
             
-            alternative_inputs.append(alt_input)
+            alternative_overrides.append({
+                # Different temperature for each alternative to produce variations
+                "parameters": {"temperature": 0.3 + (i * 0.15)},  # 0.3, 0.45, 0.6, etc.
+                "approach_name": approach_name,
+                "approach_description": approach_description
+            })
         
-        # Generate each alternative tree
-        for i, alt_input in enumerate(alternative_inputs):
-            alt_input_path = os.path.join(flow_dir, f"inputs/alt_input_{i+1}.json")
-            alt_output_path = os.path.join(flow_dir, f"alt{i+1}.json")
-            
-            # Save the alternative input
-            with open(alt_input_path, "w", encoding="utf-8") as f:
-                json.dump(alt_input, f, indent=4)
-            
-            # Run hallucinate-tree.py with the alternative input
-            alt_status = "retry"
-            while alt_status == "retry": # Loop to allow retrying the alternative generation
-                alt_status = run_program("hallucinate-tree.py", alt_input_path, alt_output_path, ["-flat", "-flow_uuid="+flow_uuid]) # Added flow_uuid
-            
-                if alt_status == "success":
-                    print(f"  Alternative tree {i+1} generated successfully at {alt_output_path}")
-                elif alt_status == "continue":
-                    print(f"  Warning: Failed to generate alternative tree {i+1}. User chose to continue.")
-                    break # Break from retry loop, continue to next alternative
-                elif alt_status == "stop":
-                    print(f"  User chose to stop the flow during alternative tree generation for {alt_input_path}.")
-                    # Create flow metadata before exiting
-                    end_time = datetime.now()
-                    time_taken = end_time - start_time
-                    flow_metadata = {
-                        "uuid": flow_uuid,
-                        "date_created": end_time.isoformat(),
-                        "task": "Complete Automation Flow (interrupted)",
-                        "time_taken": str(time_taken),
-                        "input_file": input_filepath,
-                        "programs_run": [p[0] for p in programs[:program_idx]] # Log programs run so far
-                    }
-                    metadata_path = os.path.join(flow_dir, "flow-metadata.json")
-                    with open(metadata_path, "w", encoding="utf-8") as f:
-                        json.dump(flow_metadata, f, indent=4)
-                    print(f"\nFlow process interrupted. Partial output files saved to: {os.path.abspath(flow_dir)}")
-                    sys.exit(1)
-                # If 'retry', the loop continues
+        # Save the overrides once, next to the shared input.json, instead of a full input per alternative
+        save_output({"alternatives": alternative_overrides}, flow_dir / "inputs" / "overrides.json")
+        
+        # Generate all the alternative trees at once
+        alt_jobs = []
+        for i, overrides in enumerate(alternative_overrides):
+            alt_output_path = str(flow_dir / f"alt{i+1}.json")
+            alt_input = apply_input_overrides(input_data, overrides)
+            alt_jobs.append(("hallucinate-tree.py", alt_input, alt_output_path, {"flow_uuid": flow_uuid, "flat_output": True}))
+        
+        if not run_program_group(alt_jobs):
+            print("  User chose to stop the flow during alternative tree generation.")
+            # Create flow metadata before exiting
+            end_time = datetime.now()
+            time_taken = format_time_taken(start_time)
+            flow_metadata = {
+                "uuid": flow_uuid,
+                "date_created": end_time.isoformat(),
+                "task": "Complete Automation Flow (interrupted)",
+                "time_taken": time_taken,
+                "input_file": input_filepath,
+                "programs_run": [p[0] for p in programs] # All main programs ran before the alternatives
+            }
+            metadata_path = flow_dir / "flow-metadata.json"
+            save_output(flow_metadata, metadata_path)
+            print(f"\nFlow process interrupted. Partial output files saved to: {flow_dir.resolve()}")
+            sys.exit(1)
 
     # Create flow metadata
     end_time = datetime.now()
-    time_taken = end_time - start_time
+    time_taken = format_time_taken(start_time)
     
     flow_metadata = {
         "uuid": flow_uuid,
         "date_created": end_time.isoformat(),
         "task": "Complete Automation Flow",
-        "time_taken": str(time_taken),
+        "time_taken": time_taken,
         "input_file": input_filepath,
         "programs_run": [p[0] for p in programs]
     }
     
     # Save flow metadata
-    metadata_path = os.path.join(flow_dir, "flow-metadata.json")
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(flow_metadata, f, indent=4)
+    metadata_path = flow_dir / "flow-metadata.json"
+    save_output(flow_metadata, metadata_path)
     
     # HTML generation is now handled within the main loop
     
     print(f"\nFlow process completed in {time_taken}")
-    print(f"Output files saved to: {os.path.abspath(flow_dir)}")
+    print(f"Output files saved to: {flow_dir.resolve()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
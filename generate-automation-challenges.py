@@ -1,14 +1,31 @@
 import json
 import sys
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
     create_output_metadata, get_output_filepath, handle_command_args,
-    saveToFile
+    saveToFile, cache_namespace_for, AUTOMATION_SYSTEM_PREFIX
 )
 
 flowUUID = None # Global variable for flow UUID
 
+# Prompt text that is the same for every topic, built once
+CHALLENGES_SYSTEM_MSG = AUTOMATION_SYSTEM_PREFIX + (
+    "This part covers automation challenges. "
+    "Your task is to identify and explain the current technical, practical, and "
+    "conceptual challenges that make automation difficult in a specific field or topic."
+)
+
+CHALLENGES_USER_MSG_PREFIX = (
+    "Create a list of automation challenges for the topic given at the end.\n\n"
+    "Please provide:\n"
+    "1. 4-8 specific challenges that make automation difficult in this field\n"
+    "2. For each challenge, provide a concise title and detailed explanation\n"
+    "3. Focus on technical limitations, practical constraints, and human expertise that's difficult to replicate\n\n"
+    "Format your response as a JSON object.\n"
+    "Only include challenges that are significantly relevant to the topic.\n\n"
+)
+
 def generate_automation_challenges(input_data, save_inputs=False):
     """Generate a list of challenges for automation in a specific topic."""
     # Extract information from input data
@@ -16,30 +33,26 @@ def generate_automation_challenges(input_data, save_inputs=False):
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
 
-    # Generate a list of challenges using LLM
-    systemMsg = (
-        "You are an AI assistant specialized in analyzing automation challenges. "
-        "Your task is to identify and explain the current technical, practical, and "
-        "conceptual challenges that make automation difficult in a specific field or topic."
-    )
+    # If input already contains challenges, use them directly
+    if "challenges" in input_data:
+        return input_data["challenges"]
 
-    user_msg = (
-        f"Create a list of automation challenges for: {topic}\n\n"
-        "Please provide:\n"
-        "1. 4-8 specific challenges that make automation difficult in this field\n"
-        "2. For each challenge, provide a concise title and detailed explanation\n"
-        "3. Focus on technical limitations, practical constraints, and human expertise that's difficult to replicate\n\n"
-        "Format your response as a JSON object.\n"
-        "Only include challenges that are significantly relevant to the topic."
-    )
+    # Generate a list of challenges using LLM
+    # Static instructions first and the topic last, so repeated calls share the prompt prefix
+    # (the semantic cache below embeds the topic alone, so however long this prefix grows it can't make topics match)
+    user_msg = CHALLENGES_USER_MSG_PREFIX + f"TOPIC: {topic}"
 
     # Save inputs to file if requested
     if save_inputs:
         save_path = f"flow/{flowUUID}/inputs/4-in.json"
-        saveToFile(systemMsg, user_msg, save_path)
+        saveToFile(CHALLENGES_SYSTEM_MSG, user_msg, save_path)
 
     # Use chat_with_llm to generate a list of challenges
-    response = chat_with_llm(model, systemMsg, user_msg, parameters)
+    # Deterministic runs reuse the answer for the same or a paraphrased topic; only the topic is embedded,
+    # since the fixed instructions around it would make every topic look alike
+    response = chat_with_llm(model, CHALLENGES_SYSTEM_MSG, user_msg, parameters,
+                             cache_namespace=cache_namespace_for("automation-challenges", parameters),
+                             semantic=True, semantic_text=topic)
 
     try:
         # Try to parse JSON response
@@ -50,22 +63,19 @@ def generate_automation_challenges(input_data, save_inputs=False):
         return None
 
 
-def main():
-    """Main function to run the challenge generation function."""
+def run(input_data, specified_output_filepath=None, save_inputs=False, flow_uuid=None):
+    """Run the challenge generation on already-loaded input data. Returns the output path, or None on failure."""
     global flowUUID
-    usage_msg = "Usage: python generate_automation_challenges.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
-    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
-    flowUUID = flow_uuid_arg # Set the global variable
+    flowUUID = flow_uuid # Set the global variable
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
-    input_data = load_json(input_filepath)
     challenges = generate_automation_challenges(input_data, save_inputs)
 
     if challenges is None:
         print("Failed to generate automation challenges.")
-        sys.exit(1)
+        return None
 
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -84,7 +94,16 @@ def main():
 
     save_output(output_data, output_filepath)
     print(f"Generated automation challenges, output saved to {output_filepath}")
+    return output_filepath
 
+def main():
+    """Main function to run the challenge generation function."""
+    usage_msg = "Usage: python generate_automation_challenges.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
+
+    input_data = load_json(input_filepath)
+    if run(input_data, specified_output_filepath, save_inputs, flow_uuid_arg) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
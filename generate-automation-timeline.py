@@ -1,14 +1,33 @@
 import json
 import sys
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
     create_output_metadata, get_output_filepath, handle_command_args,
-    saveToFile
+    saveToFile, cache_namespace_for, AUTOMATION_SYSTEM_PREFIX
 )
 
 flowUUID = None # Global variable for flow UUID
 
+# Prompt text that is the same for every topic, built once
+TIMELINE_SYSTEM_MSG = AUTOMATION_SYSTEM_PREFIX + (
+    "This part covers historical timelines and future predictions "
+    "for automation technologies. Your task is to create a comprehensive timeline that includes "
+    "both historical events and future predictions related to the given topic."
+)
+
+TIMELINE_USER_MSG_PREFIX = (
+    "Create an automation timeline for the topic given at the end.\n\n"
+    "Please provide:\n"
+    "1. A historical timeline showing key developments by decade (1920s through present)\n"
+    "2. Future predictions by decade showing how automation will likely progress\n"
+    "3. Continue predictions until full automation is reached (if possible)\n\n"
+    "Format your response as a JSON object with two main sections:\n"
+    "- 'historical': an object with decades as keys (e.g., '1920s', '1930s') and descriptions as values\n"
+    "- 'predictions': an object with future decades as keys (e.g., '2030s', '2040s')\n"
+    "Only include decades that have significant events relevant to the topic.\n\n"
+)
+
 def generate_automation_timeline(input_data, save_inputs=False):
     """Generate a historical timeline and future predictions for automation in a specific topic."""
     # Extract information from input data
@@ -21,31 +40,21 @@ def generate_automation_timeline(input_data, save_inputs=False):
         return input_data["timeline"]
     
     # Generate timeline using LLM
-    systemMsg = (
-        "You are an AI assistant specialized in creating historical timelines and future predictions "
-        "for automation technologies. Your task is to create a comprehensive timeline that includes "
-        "both historical events and future predictions related to the given topic."
-    )
-    
-    user_msg = (
-        f"Create an automation timeline for: {topic}\n\n"
-        "Please provide:\n"
-        "1. A historical timeline showing key developments by decade (1920s through present)\n"
-        "2. Future predictions by decade showing how automation will likely progress\n"
-        "3. Continue predictions until full automation is reached (if possible)\n\n"
-        "Format your response as a JSON object with two main sections:\n"
-        "- 'historical': an object with decades as keys (e.g., '1920s', '1930s') and descriptions as values\n"
-        "- 'predictions': an object with future decades as keys (e.g., '2030s', '2040s')\n"
-        "Only include decades that have significant events relevant to the topic."
-    )
+    # Static instructions first and the topic last, so repeated calls share the prompt prefix
+    # (the semantic cache below embeds the topic alone, so however long this prefix grows it can't make topics match)
+    user_msg = TIMELINE_USER_MSG_PREFIX + f"TOPIC: {topic}"
     
     # Save inputs to file if requested
     if save_inputs:
         save_path = f"flow/{flowUUID}/inputs/3-in.json"
-        saveToFile(systemMsg, user_msg, save_path)
+        saveToFile(TIMELINE_SYSTEM_MSG, user_msg, save_path)
     
     # Use chat_with_llm to generate timeline
-    response = chat_with_llm(model, systemMsg, user_msg, parameters)
+    # Deterministic runs reuse the answer for the same or a paraphrased topic; only the topic is embedded,
+    # since the fixed instructions around it would make every topic look alike
+    response = chat_with_llm(model, TIMELINE_SYSTEM_MSG, user_msg, parameters,
+                             cache_namespace=cache_namespace_for("automation-timeline", parameters),
+                             semantic=True, semantic_text=topic)
     
     try:
         # Try to parse JSON response
@@ -55,22 +64,19 @@ def generate_automation_timeline(input_data, save_inputs=False):
         print("Error: LLM response is not valid JSON. Full response: " + response)
         return None
 
-def main():
-    """Main function to run the timeline generation."""
+def run(input_data, specified_output_filepath=None, save_inputs=False, flow_uuid=None):
+    """Run the timeline generation on already-loaded input data. Returns the output path, or None on failure."""
     global flowUUID
-    usage_msg = "Usage: python generate_automation_timeline.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
-    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
-    flowUUID = flow_uuid_arg # Set the global variable
+    flowUUID = flow_uuid # Set the global variable
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
-    input_data = load_json(input_filepath)
     timeline = generate_automation_timeline(input_data, save_inputs)
     
     if timeline is None:
         print("Failed to generate automation timeline.")
-        sys.exit(1)
+        return None
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -89,6 +95,16 @@ def main():
 
     save_output(output_data, output_filepath)
     print(f"Generated automation timeline, output saved to {output_filepath}")
+    return output_filepath
+
+def main():
+    """Main function to run the timeline generation."""
+    usage_msg = "Usage: python generate_automation_timeline.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
+
+    input_data = load_json(input_filepath)
+    if run(input_data, specified_output_filepath, save_inputs, flow_uuid_arg) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
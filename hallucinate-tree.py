@@ -1,76 +1,162 @@
 import os
-import json
 import sys
 import uuid
 import re
-from datetime import datetime
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
-    create_output_metadata, get_output_filepath, handle_command_args, translate_to_basic_english,
-    saveToFile
+    create_output_metadata, get_output_filepath, handle_command_args, translate_to_basic_english, json_dumps,
+    saveToFile, apply_input_overrides, cache_namespace_for, JsonArrayStreamScanner
 )
 
 flowUUID = None # Global variable for flow UUID
 
+# Most steps expanded at once across the whole tree, unless the input sets "max_concurrent_llm_calls";
+# each expansion is one LLM call, so threads are enough
+MAX_PARALLEL_EXPANSIONS = 8
+
+# Opening shared by the single and batched expansion prompts, so both reuse Ollama's KV cache for it
+TREE_SYSTEM_PREFIX = (
+    "You are an AI that breaks down complex tasks into hierarchical steps. "
+    "For each task, generate a set of sub-steps needed to complete it. "
+    "Maintain clarity and logical order. "
+)
+
+# Sent unchanged with every expansion, so Ollama can reuse its KV cache for this prefix
+TREE_SYSTEM_MSG = TREE_SYSTEM_PREFIX + (
+    "Format your response as a valid JSON array of step objects, where each object has a 'step' field "
+    "and optionally a 'children' array containing substeps. "
+    "Example format: [{'step': 'Main step 1', 'children': [{'step': 'Substep 1.1'}, {'step': 'Substep 1.2'}]}, {'step': 'Main step 2'}] "
+    "Your entire response must be parseable as JSON. Do not include markdown formatting, code blocks, or commentary."
+)
+
+# Everything in an expansion's user message before the step
+TREE_USER_MSG_PREFIX = (
+    "Break down the following task into 3-7 sub-steps. "
+    "Return ONLY a JSON array of step objects, with no markdown formatting, code blocks, or extra text.\n\n"
+)
+
+# Constrains the model's output to a JSON array of steps, so no fences or commentary come back
+TREE_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "step": {"type": "string"},
+            "children": {"type": "array"}
+        },
+        "required": ["step"]
+    }
+}
+
+# Used instead when the input sets "expansion_batch_size", to expand several last-level steps in one call
+TREE_BATCH_SYSTEM_MSG = TREE_SYSTEM_PREFIX + (
+    "You will be given a numbered list of tasks. "
+    "Format your response as a valid JSON object that maps each task's number (as a string) to a JSON array "
+    "of step objects for that task, where each object has a 'step' field. "
+    "Example format: {'1': [{'step': 'Substep 1.1'}, {'step': 'Substep 1.2'}], '2': [{'step': 'Substep 2.1'}]} "
+    "Your entire response must be parseable as JSON. Do not include markdown formatting, code blocks, or commentary."
+)
+
+TREE_BATCH_USER_MSG_PREFIX = (
+    "Break down each of the following tasks into 3-7 sub-steps. "
+    "Return ONLY a JSON object mapping each task's number to its array of step objects, "
+    "with no markdown formatting, code blocks, or extra text.\n\n"
+)
+
+TREE_BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "additionalProperties": TREE_RESPONSE_SCHEMA
+}
+
+# Characters dropped from directory names, and runs of spaces/hyphens turned into one underscore
+INVALID_FILENAME_CHARS_RE = re.compile(r'[^\w\s-]')
+FILENAME_SEPARATOR_RE = re.compile(r'[\s-]+')
+# Same deletions as INVALID_FILENAME_CHARS_RE for ASCII names (most step names), done by str.translate in one C pass
+ASCII_INVALID_FILENAME_CHARS = str.maketrans("", "", "".join(
+    chr(code) for code in range(128) if INVALID_FILENAME_CHARS_RE.match(chr(code))
+))
+
 def sanitize_filename(name):
     """Convert a step name to a valid directory name using lowercase and underscores."""
     # Convert to lowercase
     sanitized = name.lower()
     # Remove invalid characters and replace spaces/hyphens with underscores
-    sanitized = re.sub(r'[^\w\s-]', '', sanitized)
-    sanitized = re.sub(r'[\s-]+', '_', sanitized)
+    if sanitized.isascii():
+        sanitized = sanitized.translate(ASCII_INVALID_FILENAME_CHARS)
+    else:
+        sanitized = INVALID_FILENAME_CHARS_RE.sub('', sanitized)
+    sanitized = FILENAME_SEPARATOR_RE.sub('_', sanitized)
     # Ensure it's not too long
     return sanitized[:40]  # Shortened to leave room for the UUID
 
+def write_node_file(node_path, node_details):
+    """Create a node's directory and write its node.json."""
+    os.makedirs(node_path, exist_ok=True)
+    with open(f"{node_path}{os.sep}node.json", "wb") as f:
+        # node.json is only read by the tools, so it's written compact
+        f.write(json_dumps(node_details, pretty=False))
+
 def save_tree_to_filesystem(tree, base_path, parent_uuid=None):
     """Save a tree structure to the filesystem where each node is a directory."""
-    # Create the base directory if it doesn't exist
-    os.makedirs(base_path, exist_ok=True)
-    
-    # Generate UUID for this node if it doesn't have one
-    if "uuid" not in tree:
-        tree["uuid"] = str(uuid.uuid4())
-    
-    # Save the node's details as node.json
-    node_details = {
-        "step": tree["step"],
-        "uuid": tree["uuid"]
-    }
+    # Normalized once, so every path below can be built by plain concatenation instead of os.path.join
+    base_path = os.path.normpath(base_path)
     
-    # Add parent UUID reference if this isn't the root node
-    if parent_uuid:
-        node_details["parent_uuid"] = parent_uuid
+    # First pass: give every node a UUID and list the nodes breadth-first (a queue instead of
+    # recursion, so deep trees can't hit the recursion limit)
+    nodes = []
+    queue = deque([tree])
+    while queue:
+        node = queue.popleft()
+        nodes.append(node)
+        queue.extend(node.get("children", []))
     
-    with open(os.path.join(base_path, "node.json"), "w", encoding="utf-8") as f:
-        json.dump(node_details, f, indent=4)
+    # Generate UUIDs for the nodes that don't have one from a single os.urandom draw, rather than one per node
+    unnamed_nodes = [node for node in nodes if "uuid" not in node]
+    random_bytes = os.urandom(16 * len(unnamed_nodes))
+    for i, node in enumerate(unnamed_nodes):
+        node["uuid"] = str(uuid.UUID(bytes=random_bytes[16 * i:16 * i + 16], version=4))
     
-    # Create child directories for each child node
-    for child in tree.get("children", []):
-        # Generate UUID for the child if it doesn't have one
-        if "uuid" not in child:
-            child["uuid"] = str(uuid.uuid4())
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_EXPANSIONS) as executor:
+        # Translate step text to Basic English for every directory name at once; each is an LLM call
+        # unless cached, and none depends on another
+        child_steps = list(dict.fromkeys(node["step"] for node in nodes[1:]))
+        basic_english_steps = dict(zip(child_steps, executor.map(translate_to_basic_english, child_steps)))
         
-        # Get the child's step text
-        child_step = child["step"]
-        
-        # Translate step text to Basic English
-        basic_english_step = translate_to_basic_english(child_step)
-        
-        # Create directory name from Basic English version
-        child_name = sanitize_filename(basic_english_step)
-        
-        # If sanitizing results in an empty string, use a generic name
-        if not child_name:
-            child_name = "step"
+        # Second pass: work out each node's directory, parents before children
+        writes = []
+        locations = {tree["uuid"]: (base_path, parent_uuid)} # uuid -> (directory, parent's uuid)
+        for node in nodes:
+            node_path, node_parent_uuid = locations[node["uuid"]]
             
-        # Use full UUID in directory name
-        dir_name = f"{child_name}_{child['uuid']}"
-        
-        # Create child directory
-        child_path = os.path.join(base_path, dir_name)
+            # Save the node's details as node.json
+            node_details = {
+                "step": node["step"],
+                "uuid": node["uuid"]
+            }
+            
+            # Add parent UUID reference if this isn't the root node
+            if node_parent_uuid:
+                node_details["parent_uuid"] = node_parent_uuid
+            writes.append((node_path, node_details))
+            
+            for child in node.get("children", []):
+                # Create directory name from Basic English version
+                child_name = sanitize_filename(basic_english_steps[child["step"]])
+                
+                # If sanitizing results in an empty string, use a generic name
+                if not child_name:
+                    child_name = "step"
+                
+                # Use full UUID in directory name, so sibling names never collide
+                # Pass the current node's UUID as the parent UUID for the child
+                locations[child["uuid"]] = (f"{node_path}{os.sep}{child_name}_{child['uuid']}", node["uuid"])
         
-        # Pass the current node's UUID as the parent UUID for the child
-        save_tree_to_filesystem(child, child_path, tree["uuid"])
+        # The writes don't depend on each other (makedirs creates any missing parents), so overlap them
+        list(executor.map(lambda write: write_node_file(*write), writes))
     
     return base_path
 
@@ -82,12 +168,8 @@ def save_tree_as_flat_json(tree, metadata, output_path):
         "tree": tree
     }
     
-    # Ensure the output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    # Save the combined data to a single JSON file
-    with open(output_path+".json", "w", encoding="utf-8") as f:
-        json.dump(output_data, f, indent=4)
+    # Save the combined data to a single JSON file (save_output creates the directory)
+    save_output(output_data, output_path+".json")
     
     return output_path
 
@@ -97,83 +179,178 @@ def generate_task_tree(input_data, save_inputs=False):
     depth = input_data.get("depth", 2)  # Default depth of 2
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
+    # Match this to the Ollama server's OLLAMA_NUM_PARALLEL; calls beyond that only queue there
+    max_concurrent = input_data.get("max_concurrent_llm_calls", MAX_PARALLEL_EXPANSIONS)
+    # Steps per LLM call at the last level; above 1, siblings share one call (for servers that can't run calls in parallel)
+    batch_size = input_data.get("expansion_batch_size", 1)
+
+    # Expansions run on separate threads but save their inputs to the same file
+    save_inputs_lock = threading.Lock()
+    # A step that recurs in the tree ("Gather materials", "Clean up", ...) is sent to the LLM once per run;
+    # later occurrences, including ones asked for while the first call is still running, share its response
+    substep_responses = {} # user message -> Future of the response text
+    substep_responses_lock = threading.Lock()
 
-    system_msg = (
-        "You are an AI that breaks down complex tasks into hierarchical steps. "
-        "For each task, generate a set of sub-steps needed to complete it. "
-        "Maintain clarity and logical order. "
-        "Format your response as a valid JSON array of step objects, where each object has a 'step' field "
-        "and optionally a 'children' array containing substeps. "
-        "Example format: [{'step': 'Main step 1', 'children': [{'step': 'Substep 1.1'}, {'step': 'Substep 1.2'}]}, {'step': 'Main step 2'}] "
-        "Your entire response must be parseable as JSON. Do not include markdown formatting, code blocks, or commentary."
-    )
-
-    def expand_step(step, current_depth):
-        if current_depth >= depth:
-            return {"step": step, "children": []}
-
-        user_msg = (
-            "Break down the following task into 3-7 sub-steps. "
-            f"Task: {step}\n\n"
-            "Return ONLY a JSON array of step objects, with no markdown formatting, code blocks, or extra text."
-        )
+    def expand_node(node, current_depth):
+        """Fill in node's children from the LLM and start expanding them; returns the futures started."""
+        step = node["step"]
+        
+        # The step goes last so the fixed instructions stay part of the shared prefix
+        user_msg = TREE_USER_MSG_PREFIX + f"Task: {step}"
         
         # Save inputs to file if requested
         if save_inputs:
             # Create unique filename for each step using timestamp
             save_path = f"flow/{flowUUID}/inputs/2-in.json"
-            saveToFile(system_msg, user_msg, save_path)
+            with save_inputs_lock:
+                saveToFile(TREE_SYSTEM_MSG, user_msg, save_path)
+        
+        if current_depth + 1 >= depth:
+            # Leaf level: the sub-steps won't be expanded further, so nothing to start early
+            node["children"] = parse_substeps(request_substeps(user_msg, step))
+            return []
+        
+        if batch_size > 1 and current_depth + 2 >= depth:
+            # The sub-steps are last-level steps: expand them together, batch_size per call, once all are known
+            children = parse_substeps(request_substeps(user_msg, step))
+            expandable = [substep for substep in children if needs_expansion(substep)]
+            node["children"] = children
+            return [
+                executor.submit(expand_node_batch, expandable[i:i + batch_size], current_depth + 1)
+                for i in range(0, len(expandable), batch_size)
+            ]
+        
+        # Stream the response and queue each sub-step's expansion as soon as its object is complete,
+        # so the children's LLM calls overlap with the rest of this response being generated
+        scanner = JsonArrayStreamScanner()
+        started = []
+        early_expansions = {} # step text -> streamed sub-steps whose expansion is already queued
+        def start_expansions(piece):
+            for substep in scanner.feed(piece):
+                if needs_expansion(substep):
+                    started.append(executor.submit(expand_node, substep, current_depth + 1))
+                    early_expansions.setdefault(substep["step"], []).append(substep)
+        
+        response_text = request_substeps(user_msg, step, on_chunk=start_expansions)
+        children = parse_substeps(response_text)
+        
+        # Keep the final parse's order; where it agrees with a streamed sub-step, use that one
+        # (its children are being filled in already) and queue anything the stream missed now
+        for index, substep in enumerate(children):
+            if needs_expansion(substep):
+                streamed = early_expansions.get(substep["step"])
+                if streamed:
+                    children[index] = streamed.pop(0)
+                else:
+                    started.append(executor.submit(expand_node, substep, current_depth + 1))
+        node["children"] = children
+        return started
+
+    def expand_node_batch(nodes, current_depth):
+        """Fill in the children of several last-level nodes with one LLM call; returns no futures."""
+        if len(nodes) == 1:
+            return expand_node(nodes[0], current_depth)
+        
+        task_lines = "\n".join(f"{number}. {node['step']}" for number, node in enumerate(nodes, 1))
+        user_msg = TREE_BATCH_USER_MSG_PREFIX + f"Tasks:\n{task_lines}"
+        
+        if save_inputs:
+            save_path = f"flow/{flowUUID}/inputs/2-in.json"
+            with save_inputs_lock:
+                saveToFile(TREE_BATCH_SYSTEM_MSG, user_msg, save_path)
         
-        # Use chat_with_llm instead of direct ollama.chat
-        response_text = chat_with_llm(model, system_msg, user_msg, parameters)
+        response_text = chat_with_llm(model, TREE_BATCH_SYSTEM_MSG, user_msg, parameters,
+                                      cache_namespace=cache_namespace_for("hallucinate-tree", parameters),
+                                      response_format=TREE_BATCH_RESPONSE_SCHEMA)
+        try:
+            substeps_by_number = parse_llm_json_response(response_text)
+        except Exception as e:
+            print(f"Error processing batched response: {e}")
+            substeps_by_number = None
+        if not isinstance(substeps_by_number, dict):
+            substeps_by_number = {}
+        
+        for number, node in enumerate(nodes, 1):
+            substeps = substeps_by_number.get(str(number))
+            if isinstance(substeps, list):
+                node["children"] = substeps
+            else:
+                # The model skipped or mangled this task: expand it on its own
+                expand_node(node, current_depth)
+        return []
+
+    def needs_expansion(substep):
+        """Whether a parsed sub-step should get its own sub-steps from the LLM."""
+        return isinstance(substep, dict) and "step" in substep and "children" not in substep
+
+    def request_substeps(user_msg, step, on_chunk=None):
+        """Ask the LLM for the sub-steps of one step, once per distinct step in this tree."""
+        with substep_responses_lock:
+            response = substep_responses.get(user_msg)
+            first_request = response is None
+            if first_request:
+                response = substep_responses[user_msg] = Future()
+        if not first_request:
+            # The first request for this step runs on another thread, so waiting on it can't deadlock
+            response_text = response.result()
+            if on_chunk is not None:
+                on_chunk(response_text)
+            return response_text
         
+        try:
+            # Use chat_with_llm instead of direct ollama.chat
+            # Steps that recur across trees ("Gather materials", ...), or paraphrases of them,
+            # come from the cache on deterministic runs; only the step is compared, not the shared instructions
+            response_text = chat_with_llm(model, TREE_SYSTEM_MSG, user_msg, parameters,
+                                          cache_namespace=cache_namespace_for("hallucinate-tree", parameters),
+                                          semantic=True, semantic_text=step, on_chunk=on_chunk,
+                                          response_format=TREE_RESPONSE_SCHEMA)
+        except BaseException as e:
+            response.set_exception(e)
+            raise
+        response.set_result(response_text)
+        return response_text
+
+    def parse_substeps(response_text):
+        """Turn an LLM response into a list of sub-steps."""
         try:
             # Use parse_llm_json_response utility with include_children=True for hierarchical data
             parsed_steps = parse_llm_json_response(response_text, include_children=True)
             
             if isinstance(parsed_steps, list):
-                # Process each step recursively if we're not at max depth
-                if current_depth + 1 < depth:
-                    for substep in parsed_steps:
-                        if isinstance(substep, dict) and "step" in substep and "children" not in substep:
-                            substep_text = substep["step"]
-                            child_tree = expand_step(substep_text, current_depth + 1)
-                            substep["children"] = child_tree.get("children", [])
-                return {"step": step, "children": parsed_steps}
+                return parsed_steps
             else:
                 # If response isn't a list, create a simple step
-                return {"step": step, "children": []}
+                return []
                 
         except Exception as e:
             print(f"Error processing response: {e}")
             # Fallback: create a simple structure
-            return {"step": step, "children": [{"step": response_text, "children": []}]}
+            return [{"step": response_text, "children": []}]
 
-    tree = expand_step(task, 0)
+    tree = {"step": task, "children": []}
+    if depth > 0:
+        # Every node is expanded by a task on one shared pool, and each task queues its children's
+        # expansions rather than recursing into them, so the tree's depth never adds to the stack
+        # and no thread sits waiting on another; keep collecting queued tasks until none are left
+        with ThreadPoolExecutor(max_workers=max_concurrent) as executor:
+            pending = {executor.submit(expand_node, tree, 0)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.update(future.result())
     # Generate UUID for root node
     tree["uuid"] = str(uuid.uuid4())
     return tree
 
-def main():
-    """Main function to run the hallucination-based tree generation."""
+def run(input_data, specified_output_path=None, save_inputs=False, flow_uuid=None, flat_output=False):
+    """Generate a tree from already-loaded input data and save it. Returns the output path."""
     global flowUUID
-    usage_msg = "Usage: python hallucinate-tree.py <input_json> [output_dir] [-flat] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
-    
-    # Use handle_command_args utility and check for -flat flag
-    args = sys.argv[1:]
-    flat_output = "-flat" in args
-    if flat_output:
-        args.remove("-flat")
-    
-    # Update to pass the remaining args to handle_command_args
-    sys.argv = [sys.argv[0]] + args
-    input_filepath, specified_output_path, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
-    flowUUID = flow_uuid_arg # Set the global variable
+    flowUUID = flow_uuid # Set the global variable
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
-    input_data = load_json(input_filepath)
     tree_content = generate_task_tree(input_data, save_inputs)
     
     # Generate a UUID for this tree
@@ -205,19 +382,71 @@ def main():
         # Save as flat JSON
         output_path = save_tree_as_flat_json(tree_content, metadata, output_filepath)
         print(f"Generated tree as flat JSON, output saved to {output_path}")
+        return output_path
     else:
         # Original behavior: save as directory structure
         # Create the base output directory if it doesn't exist
         os.makedirs(base_output_dir, exist_ok=True)
         
         # Save metadata to the base directory
-        with open(os.path.join(base_output_dir, "metadata.json"), "w", encoding="utf-8") as f:
-            json.dump(metadata, f, indent=4)
+        save_output(metadata, os.path.join(base_output_dir, "metadata.json"))
         
         # Save the tree structure to the filesystem
         tree_root_dir = save_tree_to_filesystem(tree_content, base_output_dir)
         
         print(f"Generated initial tree, output saved to {tree_root_dir}")
+        return tree_root_dir
+
+def main():
+    """Main function to run the hallucination-based tree generation."""
+    usage_msg = "Usage: python hallucinate-tree.py <input_json> [output_dir] [-flat] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"] [--alt-index N --overrides-file <overrides_json>]"
+    
+    # Use handle_command_args utility and check for -flat flag
+    args = sys.argv[1:]
+    flat_output = "-flat" in args
+    if flat_output:
+        args.remove("-flat")
+    
+    # Check for --alt-index/--overrides-file (generate one of a flow's alternatives from its shared input)
+    alt_index = None
+    overrides_filepath = None
+    for flag in ("--alt-index", "--overrides-file"):
+        if flag in args:
+            position = args.index(flag)
+            if position + 1 >= len(args):
+                print(usage_msg)
+                sys.exit(1)
+            value = args[position + 1]
+            del args[position:position + 2]
+            if flag == "--alt-index":
+                # Alternatives are numbered from 1, like the flow's alt1.json, alt2.json, ...
+                try:
+                    alt_index = int(value)
+                except ValueError:
+                    alt_index = 0
+                if alt_index < 1:
+                    print(usage_msg)
+                    sys.exit(1)
+            else:
+                overrides_filepath = value
+    if (alt_index is None) != (overrides_filepath is None):
+        print(usage_msg)
+        sys.exit(1)
+    
+    # Update to pass the remaining args to handle_command_args
+    sys.argv = [sys.argv[0]] + args
+    input_filepath, specified_output_path, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
+
+    input_data = load_json(input_filepath)
+    if overrides_filepath:
+        try:
+            overrides = load_json(overrides_filepath)["alternatives"][alt_index - 1]
+        except (KeyError, IndexError, TypeError):
+            print(f"Error: {overrides_filepath} has no alternative {alt_index}")
+            print(usage_msg)
+            sys.exit(1)
+        input_data = apply_input_overrides(input_data, overrides)
+    run(input_data, specified_output_path, save_inputs, flow_uuid_arg, flat_output)
 
 if __name__ == "__main__":
     main()
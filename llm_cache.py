@@ -0,0 +1,200 @@
+import functools
+import hashlib
+import json
+import math
+import operator
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Cached responses live under .cache/<namespace>/<key>.json in the working directory
+CACHE_DIR = ".cache"
+
+# Entries older than this are treated as misses and rewritten, so model updates eventually show through
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Most entries kept per namespace; the oldest are removed past this
+CACHE_MAX_ENTRIES = 10000
+
+# Namespaces already trimmed by this process
+_trimmed_namespaces = set()
+
+# Responses read or written by this process, most recently used last, so repeat lookups skip the disk:
+# (namespace, key) -> response text
+MEMORY_CACHE_MAX_ENTRIES = 4096
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+def _remember_response(namespace, key, response):
+    """Put a response in the in-memory tier, dropping the least recently used entry when it is full."""
+    with _memory_cache_lock:
+        _memory_cache[(namespace, key)] = response
+        _memory_cache.move_to_end((namespace, key))
+        if len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+@functools.lru_cache(maxsize=1024)
+def _encode_json(value):
+    """JSON-encode a string or a sorted tuple of parameter items, once per distinct value."""
+    if isinstance(value, tuple):
+        value = dict(value)
+    return json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+def _params_fingerprint(parameters):
+    """Return parameters JSON-encoded with sorted keys, memoized when every value is hashable."""
+    try:
+        return _encode_json(tuple(sorted(parameters.items())))
+    except TypeError:
+        # Unhashable values (e.g. a list of stop sequences) are encoded every time
+        return json.dumps(parameters, sort_keys=True, ensure_ascii=False).encode("utf-8")
+
+def make_cache_key(model, system_message, user_message, parameters=None):
+    """Hash everything that determines an LLM response into a short hex key."""
+    # Hashes the same bytes as json.dumps([model, system_message, user_message, parameters]),
+    # so existing cache entries stay valid, but the long system message and the parameters
+    # that repeat on every call are only encoded once
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(b"[")
+    digest.update(_encode_json(model))
+    digest.update(b", ")
+    digest.update(_encode_json(system_message))
+    digest.update(b", ")
+    digest.update(json.dumps(user_message, ensure_ascii=False).encode("utf-8"))
+    digest.update(b", ")
+    digest.update(_params_fingerprint(parameters or {}))
+    digest.update(b"]")
+    return digest.hexdigest()
+
+def get_cache_path(namespace, key):
+    """Return the file path for a cache entry."""
+    return os.path.join(CACHE_DIR, namespace, f"{key}.json")
+
+def load_cached_response(namespace, key):
+    """Return the cached response text for key, or None on a miss."""
+    with _memory_cache_lock:
+        response = _memory_cache.get((namespace, key))
+        if response is not None:
+            _memory_cache.move_to_end((namespace, key))
+            return response
+    
+    cache_path = get_cache_path(namespace, key)
+    try:
+        if time.time() - os.path.getmtime(cache_path) > CACHE_TTL_SECONDS:
+            return None # Expired
+        with open(cache_path, "r", encoding="utf-8") as file:
+            response = json.load(file)["response"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing, unreadable or half-written entries all count as misses
+        return None
+    _remember_response(namespace, key, response)
+    return response
+
+def save_cached_response(namespace, key, response):
+    """Store a response atomically so concurrent readers never see a partial file."""
+    cache_path = get_cache_path(namespace, key)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Unique per process and thread, so concurrent writers of the same key never share a temp file
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump({"response": response}, file, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    _remember_response(namespace, key, response)
+    # Check the namespace's size once per process rather than on every write
+    if namespace not in _trimmed_namespaces:
+        _trimmed_namespaces.add(namespace)
+        trim_cache(namespace)
+
+def trim_cache(namespace, max_entries=CACHE_MAX_ENTRIES):
+    """Delete a namespace's oldest entries beyond max_entries."""
+    namespace_dir = os.path.join(CACHE_DIR, namespace)
+    entries = []
+    with os.scandir(namespace_dir) as scan:
+        for entry in scan:
+            if entry.name.endswith(".json") and entry.is_file():
+                entries.append((entry.stat().st_mtime, entry.path))
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass # Already removed by another process
+
+# Paraphrased prompts whose embeddings are more similar than this share a cached response
+SEMANTIC_THRESHOLD = 0.93
+
+# Embedding index per namespace, loaded from disk on first use. Entries are grouped by context key (model,
+# system message and parameters), so a lookup only ever compares prompts sent with the same system message,
+# and embeddings are stored scaled to unit length, so similarity is a plain dot product:
+# {namespace: {context_key: [(unit_embedding, key), ...]}}
+_semantic_indexes = {}
+# Held while an index is loaded, read or added to, since expansions and batch inputs use it from several threads
+_semantic_index_lock = threading.Lock()
+
+def get_semantic_index_path(namespace):
+    """Return the path of a namespace's embedding index."""
+    return os.path.join(CACHE_DIR, namespace, "semantic-index.jsonl")
+
+def unit_vector(vector):
+    """Return vector scaled to length 1 (unchanged if it is all zeros)."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return vector
+    return [x / norm for x in vector]
+
+def load_semantic_index(namespace):
+    """Return the in-memory embedding index for a namespace, reading it from disk the first time."""
+    with _semantic_index_lock:
+        return _load_semantic_index_locked(namespace)
+
+def _load_semantic_index_locked(namespace):
+    """load_semantic_index for callers already holding _semantic_index_lock."""
+    index = _semantic_indexes.get(namespace)
+    if index is None:
+        index = {}
+        try:
+            with open(get_semantic_index_path(namespace), "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        index.setdefault(entry["context"], []).append((unit_vector(entry["embedding"]), entry["key"]))
+                    except (ValueError, KeyError, TypeError):
+                        continue # Skip a line cut short by an interrupted write
+        except OSError:
+            pass
+        _semantic_indexes[namespace] = index
+    return index
+
+def find_similar_response(namespace, context_key, embedding, threshold=SEMANTIC_THRESHOLD):
+    """
+    Return the cached response whose prompt embedding is most similar to embedding, or None.
+    Only entries with the same context_key (model, system message and parameters) are compared.
+    """
+    query = unit_vector(embedding)
+    with _semantic_index_lock:
+        # A copy, so entries added by other threads meanwhile don't change the list being scanned
+        entries = list(_load_semantic_index_locked(namespace).get(context_key, ()))
+    best_key, best_similarity = None, threshold
+    for entry_embedding, key in entries:
+        # Cosine similarity, as both vectors have unit length
+        similarity = sum(map(operator.mul, query, entry_embedding))
+        if similarity > best_similarity:
+            best_key, best_similarity = key, similarity
+    if best_key is None:
+        return None
+    return load_cached_response(namespace, best_key)
+
+def add_semantic_entry(namespace, context_key, embedding, key):
+    """Record the embedding of a cached prompt so paraphrases of it can find the response."""
+    line = (json.dumps({"context": context_key, "embedding": embedding, "key": key}) + "\n").encode("utf-8")
+    index_path = get_semantic_index_path(namespace)
+    with _semantic_index_lock:
+        _load_semantic_index_locked(namespace).setdefault(context_key, []).append((unit_vector(embedding), key))
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        # One write on an O_APPEND descriptor, so lines from other processes sharing the cache can't interleave with it
+        fd = os.open(index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
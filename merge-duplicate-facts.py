@@ -2,53 +2,121 @@
 import json
 import sys
 import uuid
-from datetime import datetime
+import time
 import re
 from utils import (
-    load_json, save_output, chat_with_llm, parse_llm_json_response,
-    create_output_metadata, get_output_filepath, handle_command_args
+    load_json, save_output, chat_with_llm, extract_json_from_response, LLM_FENCE_RE,
+    create_output_metadata, get_output_filepath, handle_command_args,
+    pop_flag_value, run_batch_inputs,
+    cache_namespace_for
 )
 
+# Facts whose word 3-shingles overlap at least this much (Jaccard) are near-duplicates and only one is sent
+NEAR_DUPLICATE_THRESHOLD = 0.85
+# One fact per non-blank line of a plain-text response, without a leading "- ", "* " or "1. " and surrounding whitespace
+FACT_LINE_RE = re.compile(r"^[ \t]*(?:[-*][ \t]+|\d+[.)][ \t]+)?(\S[^\n]*?)[ \t\r]*$", re.MULTILINE)
+# Punctuation ignored when comparing facts
+FACT_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+MERGE_FACTS_SYSTEM_MSG = (
+    "You are an AI assistant that identifies duplicate or similar facts in a list. "
+    "When you find duplicates, merge them into a single, comprehensive fact. "
+    "Organize the facts logically and remove redundancy. "
+    "Format your response as a JSON array of strings, where each string is a unique fact. "
+    "Your entire response must be parseable as JSON."
+)
+
+def fact_shingles(fact):
+    """Return the set of word 3-shingles of a fact, ignoring case and punctuation."""
+    words = FACT_PUNCTUATION_RE.sub("", str(fact).lower()).split()
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+def prefilter_duplicate_facts(facts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Drop facts that are identical or near-identical to another, keeping the longest of each group
+    in its original position, so the LLM only has to merge the facts that actually differ.
+    """
+    # Longest first, so each group's representative is its most complete wording
+    order = sorted(range(len(facts)), key=lambda i: len(str(facts[i])), reverse=True)
+    kept = [] # (index, shingles)
+    seen_shingles = set()
+    for i in order:
+        shingles = fact_shingles(facts[i])
+        key = frozenset(shingles)
+        if key in seen_shingles:
+            continue # Same words as a kept fact (after normalizing)
+        duplicate = False
+        for _, kept_shingles in kept:
+            # Jaccard can't reach threshold when the sizes are too different, so skip the set work
+            if len(shingles) < threshold * len(kept_shingles):
+                continue
+            if len(shingles & kept_shingles) >= threshold * len(shingles | kept_shingles):
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((i, shingles))
+            seen_shingles.add(key)
+    return [facts[i] for i in sorted(index for index, _ in kept)]
+
 def merge_duplicate_facts(input_data):
     """Merge duplicate or similar facts in the input list."""
-    facts = input_data.get("facts", [])
+    facts = prefilter_duplicate_facts(input_data.get("facts", []))
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
-
-    system_msg = (
-        "You are an AI assistant that identifies duplicate or similar facts in a list. "
-        "When you find duplicates, merge them into a single, comprehensive fact. "
-        "Organize the facts logically and remove redundancy. "
-        "Format your response as a JSON array of strings, where each string is a unique fact. "
-        "Your entire response must be parseable as JSON."
-    )
     
     user_msg = (
         "Identify duplicate or similar facts in the following list and merge them into unique facts:\n\n" +
         "\n".join([f"- {fact}" for fact in facts])
     )
     
-    # Use chat_with_llm instead of direct ollama.chat
-    response_text = chat_with_llm(model, system_msg, user_msg, parameters)
+    # Use chat_with_llm instead of direct ollama.chat (deterministic runs on the same facts come from the cache)
+    response_text = chat_with_llm(model, MERGE_FACTS_SYSTEM_MSG, user_msg, parameters,
+                                  cache_namespace=cache_namespace_for("merge-duplicate-facts", parameters))
     
-    # Use parse_llm_json_response utility
-    merged_facts = parse_llm_json_response(response_text, include_children=False)
+    merged_facts = extract_json_from_response(response_text)
+    if isinstance(merged_facts, dict):
+        # An object wrapping the list, like {"facts": [...]}: use its list
+        merged_facts = next((value for value in merged_facts.values() if isinstance(value, list)), None)
+    elif merged_facts is None:
+        text = LLM_FENCE_RE.sub("", response_text).strip()
+        if text[:1] not in ("[", "{"):
+            # No JSON at all: take the response as one fact per line, with bullets or numbering removed in the same
+            # regex pass, leaving out lines that are only brackets or punctuation
+            # (JSON that didn't parse is not split up, so its syntax can't end up saved as facts)
+            merged_facts = [fact for fact in FACT_LINE_RE.findall(text) if FACT_PUNCTUATION_RE.sub("", fact).strip()]
     
-    if not isinstance(merged_facts, list):
+    if not isinstance(merged_facts, list) or not merged_facts:
         merged_facts = ["No valid facts could be merged"]
     
     return merged_facts
 
+def build_output(input_data):
+    """Merge the facts of one input and return the output fields."""
+    return {
+        "merged_facts": merge_duplicate_facts(input_data)
+    }
+
 def main():
     """Main function to run the fact merging."""
-    usage_msg = "Usage: python merge-duplicate-facts.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    usage_msg = "Usage: python merge-duplicate-facts.py <input_json> [output_json] | --batch-inputs <input_glob>"
+    
+    # --batch-inputs: run every matching input file in this process, each to its own output file
+    batch_pattern = pop_flag_value("--batch-inputs", usage_msg)
+    if batch_pattern:
+        if run_batch_inputs(batch_pattern, build_output, "merge-duplicate-facts", "Merge Duplicate Facts"):
+            sys.exit(1)
+        return
+    
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     input_data = load_json(input_filepath)
-    merged_facts = merge_duplicate_facts(input_data)
+    output_fields = build_output(input_data)
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -62,7 +130,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "merged_facts": merged_facts
+        **output_fields
     }
 
     save_output(output_data, output_filepath)
@@ -1,39 +1,61 @@
-from datetime import datetime
+import sys
+import time
 from utils import (
     load_json, save_output, chat_with_llm,
-    create_output_metadata, get_output_filepath, handle_command_args
+    create_output_metadata, get_output_filepath, handle_command_args,
+    pop_flag_value, run_batch_inputs,
+    cache_namespace_for
 )
 
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+PROMPT_SYSTEM_MSG = (
+    "You are a knowledgeable assistant specialized in providing accurate, concise, and informative facts about various topics. "
+    "Your responses should be factual, specific, and organized. "
+    "When asked about a subject, provide clear, detailed information based on your knowledge, focusing on relevant details. "
+    "Present your information in a clear, structured format with one fact per line. "
+    "Avoid unnecessary commentary, opinions, or irrelevant details. "
+    "Focus on providing factual, educational content about the requested topic."
+    "Focus on having a wide variety of facts."
+    "Output the instructions in a simple list format with no numbers, symbols, markdown, or extra formatting. ")
+
 def generate_prompt_response(input_data):
     """Generate a response to the user's prompt."""
     prompt = input_data.get("prompt", "")
     model = input_data.get("model", "gemma3")
-    system_message = (
-        "You are a knowledgeable assistant specialized in providing accurate, concise, and informative facts about various topics. "
-        "Your responses should be factual, specific, and organized. "
-        "When asked about a subject, provide clear, detailed information based on your knowledge, focusing on relevant details. "
-        "Present your information in a clear, structured format with one fact per line. "
-        "Avoid unnecessary commentary, opinions, or irrelevant details. "
-        "Focus on providing factual, educational content about the requested topic."
-        "Focus on having a wide variety of facts."
-        "Output the instructions in a simple list format with no numbers, symbols, markdown, or extra formatting. ")
     parameters = input_data.get("parameters", {})
 
-    # Use chat_with_llm instead of direct ollama.chat
-    response_content = chat_with_llm(model, system_message, prompt, parameters)
+    # Use chat_with_llm instead of direct ollama.chat (deterministic runs of a repeated prompt come from the cache)
+    response_content = chat_with_llm(model, PROMPT_SYSTEM_MSG, prompt, parameters,
+                                     cache_namespace=cache_namespace_for("prompt", parameters))
     
     return response_content
 
+def build_output(input_data):
+    """Generate the response for one input and return the output fields."""
+    response_content = generate_prompt_response(input_data)
+    return {
+        "prompt": input_data.get("prompt", ""),
+        "response": response_content.splitlines()
+    }
+
 def main():
     """Main function to run the prompt response generation."""
-    usage_msg = "Usage: python prompt.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    usage_msg = "Usage: python prompt.py <input_json> [output_json] | --batch-inputs <input_glob>"
+    
+    # --batch-inputs: run every matching input file in this process, each to its own output file
+    batch_pattern = pop_flag_value("--batch-inputs", usage_msg)
+    if batch_pattern:
+        if run_batch_inputs(batch_pattern, build_output, "prompt", "Prompt Response"):
+            sys.exit(1)
+        return
+    
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     input_data = load_json(input_filepath)
-    response_content = generate_prompt_response(input_data)
+    output_fields = build_output(input_data)
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -47,8 +69,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "prompt": input_data.get("prompt", ""),
-        "response": response_content.split("\n")
+        **output_fields
     }
 
     save_output(output_data, output_filepath)
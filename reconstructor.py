@@ -2,7 +2,7 @@ import os
 import json
 import sys
 import uuid
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, create_output_metadata, get_output_filepath
 )
@@ -15,27 +15,47 @@ def find_node_by_uuid(search_uuid, base_dir='output'):
         if "node.json" in files:
             node_path = os.path.join(root, "node.json")
             try:
-                with open(node_path, 'r', encoding='utf-8') as f:
-                    node_data = json.load(f)
-                    
-                    # Check if this is the node we're looking for
-                    if node_data.get("uuid", "").lower() == search_uuid:
-                        node_data["filepath"] = node_path
-                        return node_data
+                node_data = load_json(node_path)
+                
+                # Check if this is the node we're looking for
+                if node_data.get("uuid", "").lower() == search_uuid:
+                    node_data["filepath"] = node_path
+                    return node_data
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Error reading {node_path}: {e}")
     
     return None
 
-def get_parent_chain(node_data, search_dir='output'):
+def build_uuid_index(base_dir='output'):
+    """Read every node.json under base_dir once and index the nodes by lowercase UUID."""
+    uuid_index = {}
+    
+    for root, dirs, files in os.walk(base_dir):
+        if "node.json" in files:
+            node_path = os.path.join(root, "node.json")
+            try:
+                node_data = load_json(node_path)
+                node_data["filepath"] = node_path
+                # Keep the first match, as find_node_by_uuid does
+                uuid_index.setdefault(node_data.get("uuid", "").lower(), node_data)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"Error reading {node_path}: {e}")
+    
+    return uuid_index
+
+def get_parent_chain(node_data, search_dir='output', uuid_index=None):
     """Build a chain of nodes from the given node up to the root."""
+    # Walk the directory once up front instead of once per ancestor
+    if uuid_index is None:
+        uuid_index = build_uuid_index(search_dir)
+    
     node_chain = [node_data]
     current_node = node_data
     
     # Continue until we reach a node without a parent (the root)
     while "parent_uuid" in current_node:
         parent_uuid = current_node["parent_uuid"]
-        parent_node = find_node_by_uuid(parent_uuid, search_dir)
+        parent_node = uuid_index.get(parent_uuid.lower())
         
         if parent_node is None:
             print(f"Warning: Could not find parent with UUID {parent_uuid}")
@@ -122,10 +142,13 @@ def main():
     
     print(f"Searching for node with UUID: {search_uuid}")
     print(f"Search directory: {search_directory}")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
+    
+    # Index all nodes once; the target and every ancestor are looked up from it
+    uuid_index = build_uuid_index(search_directory)
     
     # Find the node with the specified UUID
-    node_data = find_node_by_uuid(search_uuid, search_directory)
+    node_data = uuid_index.get(search_uuid.lower())
     
     if node_data is None:
         print(f"Error: Could not find a node with UUID {search_uuid} in directory {search_directory}")
@@ -135,7 +158,7 @@ def main():
     
     # Get the chain of nodes from root to this node
     print(f"Building parent chain...")
-    node_chain = get_parent_chain(node_data, search_directory)
+    node_chain = get_parent_chain(node_data, search_directory, uuid_index)
     
     print(f"Found path with {len(node_chain)} nodes from root to target")
     
@@ -1,30 +1,35 @@
-from datetime import datetime
+import sys
+import time
 from utils import (
     load_json, save_output, chat_with_llm, parse_llm_json_response,
-    create_output_metadata, get_output_filepath, handle_command_args
+    create_output_metadata, get_output_filepath, handle_command_args,
+    pop_flag_value, run_batch_inputs,
+    cache_namespace_for
 )
 
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+SEARCH_QUERIES_SYSTEM_MSG = ("You are a search query generation assistant. "
+                             "Your task is to take a given topic and generate multiple high-quality search engine queries that help retrieve comprehensive, relevant, and useful information. "
+                             "For each topic, generate a variety of queries, including: "
+                             "General queries that provide a broad overview"
+                             "Specific queries targeting authoritative sources"
+                             "Question-based queries to find FAQ-style answers"
+                             "Alternative phrasings to ensure diverse results"
+                             "Advanced search operator queries (e.g., site:, filetype:, intitle:) for precision."
+                             "Output the queries in a simple list format with no numbers, symbols, or extra formatting."
+                             "Separate each query with a single newline.")
+
 def generate_search_queries(input_data):
     """Generate search queries based on the input topic."""
     topic = input_data.get("topic", "")
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
-
-    systemMsg = ("You are a search query generation assistant. "
-                 "Your task is to take a given topic and generate multiple high-quality search engine queries that help retrieve comprehensive, relevant, and useful information. "
-                 "For each topic, generate a variety of queries, including: "
-                 "General queries that provide a broad overview"
-                 "Specific queries targeting authoritative sources"
-                 "Question-based queries to find FAQ-style answers"
-                 "Alternative phrasings to ensure diverse results"
-                 "Advanced search operator queries (e.g., site:, filetype:, intitle:) for precision."
-                 "Output the queries in a simple list format with no numbers, symbols, or extra formatting."
-                 "Separate each query with a single newline.")
     
     user_msg = f"Generate search queries for the following topic:\n\n{topic}"
     
-    # Use chat_with_llm instead of direct ollama.chat
-    response_text = chat_with_llm(model, systemMsg, user_msg, parameters)
+    # Use chat_with_llm instead of direct ollama.chat (deterministic runs for a repeated topic come from the cache)
+    response_text = chat_with_llm(model, SEARCH_QUERIES_SYSTEM_MSG, user_msg, parameters,
+                                  cache_namespace=cache_namespace_for("search-queries", parameters))
     
     # Use parse_llm_json_response utility
     queries = parse_llm_json_response(response_text, include_children=False)
@@ -34,16 +39,31 @@ def generate_search_queries(input_data):
     
     return queries
 
+def build_output(input_data):
+    """Generate the search queries for one input and return the output fields."""
+    return {
+        "topic": input_data.get("topic", ""),
+        "queries": generate_search_queries(input_data)
+    }
+
 def main():
     """Main function to run the search query generation."""
-    usage_msg = "Usage: python search-queries.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    usage_msg = "Usage: python search-queries.py <input_json> [output_json] | --batch-inputs <input_glob>"
+    
+    # --batch-inputs: run every matching input file in this process, each to its own output file
+    batch_pattern = pop_flag_value("--batch-inputs", usage_msg)
+    if batch_pattern:
+        if run_batch_inputs(batch_pattern, build_output, "search-queries", "Search Queries"):
+            sys.exit(1)
+        return
+    
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     input_data = load_json(input_filepath)
-    queries = generate_search_queries(input_data)
+    output_fields = build_output(input_data)
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -57,8 +77,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "topic": input_data.get("topic", ""),
-        "queries": queries
+        **output_fields
     }
 
     save_output(output_data, output_filepath)
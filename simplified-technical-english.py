@@ -1,61 +1,72 @@
-import json
-from datetime import datetime
+import sys
+import time
 from utils import (
     load_json, save_output, chat_with_llm,
-    create_output_metadata, get_output_filepath, handle_command_args
+    create_output_metadata, get_output_filepath, handle_command_args,
+    pop_flag_value, run_batch_inputs,
+    build_conversion_prompt, cache_namespace_for
 )
 
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+STE_SYSTEM_MSG = ("Convert the given text into Simplified Technical English. "
+                  "Follow these Simplified Technical English rules:\n"
+                  "1. Use only approved technical words for your technical domain\n"
+                  "2. Keep sentences short (20 words or less)\n"
+                  "3. Use simple present tense when possible\n"
+                  "4. Be specific and avoid ambiguity\n"
+                  "5. Use active voice instead of passive\n"
+                  "6. One instruction per sentence\n"
+                  "7. Use articles (the, a, an) consistently\n"
+                  "8. Use the same term consistently for each concept\n"
+                  "9. Avoid slang, jargon, and colloquialisms\n"
+                  "10. Use approved technical vocabulary only")
+
 def translate_simplified_technical_english(input_data):
     """Convert the input text to Simplified Technical English."""
-    prompt = f"""
-    {" ".join(input_data.get("input_text", []))}
-    Output Format: {input_data["output_format"]}
-    """
-
-    if "success_criteria" in input_data:
-        criteria_str = json.dumps(input_data["success_criteria"], indent=2)
-        prompt += f"\n\nSuccess Criteria:\n{criteria_str}"
-
-    systemMsg = ("Convert the given text into Simplified Technical English. "
-                 "Follow these Simplified Technical English rules:\n"
-                 "1. Use only approved technical words for your technical domain\n"
-                 "2. Keep sentences short (20 words or less)\n"
-                 "3. Use simple present tense when possible\n"
-                 "4. Be specific and avoid ambiguity\n"
-                 "5. Use active voice instead of passive\n"
-                 "6. One instruction per sentence\n"
-                 "7. Use articles (the, a, an) consistently\n"
-                 "8. Use the same term consistently for each concept\n"
-                 "9. Avoid slang, jargon, and colloquialisms\n"
-                 "10. Use approved technical vocabulary only")
+    prompt = build_conversion_prompt(input_data)
 
     # Use chat_with_llm instead of direct ollama.chat call
+    # Deterministic runs on the same text come from the cache
+    parameters = input_data.get("parameters", {})
     response_content = chat_with_llm(
         model=input_data["model"],
-        system_message=systemMsg,
+        system_message=STE_SYSTEM_MSG,
         user_message=prompt,
-        parameters=input_data.get("parameters", {})
+        parameters=parameters,
+        cache_namespace=cache_namespace_for("simplified-technical-english", parameters)
     )
 
     return response_content
 
+def build_output(input_data):
+    """Convert one input and return the output fields."""
+    output_content = translate_simplified_technical_english(input_data)
+    
+    # Process output to handle potential paragraph structure: each non-empty paragraph is an item,
+    # stripped once
+    output_lines = [paragraph for paragraph in map(str.strip, output_content.split('\n\n')) if paragraph]
+    return {
+        "output_text": output_lines
+    }
+
 def main():
     """Main function to run the Simplified Technical English conversion."""
-    usage_msg = "Usage: python simplified-technical-english.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    usage_msg = "Usage: python simplified-technical-english.py <input_json> [output_json] | --batch-inputs <input_glob>"
+    
+    # --batch-inputs: run every matching input file in this process, each to its own output file
+    batch_pattern = pop_flag_value("--batch-inputs", usage_msg)
+    if batch_pattern:
+        if run_batch_inputs(batch_pattern, build_output, "simplified-technical-english", "Simplified Technical English conversion"):
+            sys.exit(1)
+        return
+    
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
-
-    input_data = load_json(input_filepath)
-    output_content = translate_simplified_technical_english(input_data)
+    start_time = time.perf_counter()
     
-    # Process output to handle potential paragraph structure
-    output_lines = []
-    for paragraph in output_content.split('\n\n'):
-        # Add each paragraph as an item, or split further by lines if appropriate
-        if len(paragraph.strip()) > 0:
-            output_lines.append(paragraph.strip())
+    input_data = load_json(input_filepath)
+    output_fields = build_output(input_data)
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -69,7 +80,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "output_text": output_lines
+        **output_fields
     }
 
     save_output(output_data, output_filepath)
@@ -1,55 +1,13 @@
-import json
 import sys
-import re
-from datetime import datetime
+import time
 from utils import (
     load_json, save_output, chat_with_llm,
     create_output_metadata, get_output_filepath, handle_command_args,
-    saveToFile
+    saveToFile, AUTOMATION_SYSTEM_PREFIX, extract_json_from_response
 )
 
 flowUUID = None # Global variable for flow UUID
 
-def sanitize_json_string(json_str):
-    """Remove control characters and other invalid characters from a JSON string."""
-    # Replace control characters that are invalid in JSON
-    # This regex matches control characters (ASCII 0-31) except tabs, newlines and carriage returns
-    sanitized = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', json_str)
-    return sanitized
-
-def extract_json_from_response(response):
-    """Extract and parse JSON from various formats in LLM responses."""
-    # First try direct parsing
-    try:
-        return json.loads(sanitize_json_string(response))
-    except json.JSONDecodeError:
-        pass
-    
-    # Try extracting from code fence markers
-    if "```json" in response or "```" in response:
-        try:
-            # Extract content between code fence markers with or without language specifier
-            if "```json" in response:
-                json_content = response.split("```json", 1)[1].split("```", 1)[0].strip()
-            else:
-                json_content = response.split("```", 1)[1].split("```", 1)[0].strip()
-            
-            return json.loads(sanitize_json_string(json_content))
-        except (json.JSONDecodeError, IndexError) as e:
-            print(f"Error extracting JSON from code block: {str(e)}")
-    
-    # Look for content between curly braces
-    try:
-        if "{" in response and "}" in response:
-            start = response.find("{")
-            end = response.rfind("}") + 1
-            potential_json = response[start:end]
-            return json.loads(sanitize_json_string(potential_json))
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON between curly braces: {str(e)}")
-    
-    return None
-
 def generate_industrial_specifications(input_data, save_inputs=False):
     """Generate industrial specifications for a given topic."""
     # Extract information from input data
@@ -57,8 +15,8 @@ def generate_industrial_specifications(input_data, save_inputs=False):
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
     
-    systemMsg = (
-        "You are an AI assistant specialized in industrial engineering and specifications. "
+    systemMsg = AUTOMATION_SYSTEM_PREFIX + (
+        "This part covers industrial engineering and specifications. "
         "For the given topic, provide a comprehensive overview of industrial/commercial specifications "
         "including performance metrics and implementation requirements. "
         "Be precise with numerical values and include ranges where appropriate. "
@@ -93,22 +51,19 @@ def generate_industrial_specifications(input_data, save_inputs=False):
     
     return specs_data
 
-def main():
-    """Main function to run the industrial specifications analysis."""
+def run(input_data, specified_output_filepath=None, save_inputs=False, flow_uuid=None):
+    """Run the industrial specifications analysis on already-loaded input data. Returns the output path, or None on failure."""
     global flowUUID
-    usage_msg = "Usage: python specifications-industrial.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
-    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
-    flowUUID = flow_uuid_arg # Set the global variable
+    flowUUID = flow_uuid # Set the global variable
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
-    input_data = load_json(input_filepath)
     specs_data = generate_industrial_specifications(input_data, save_inputs)
     
     if specs_data is None:
         print("Failed to generate industrial specifications.")
-        sys.exit(1)
+        return None
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -127,6 +82,16 @@ def main():
 
     save_output(output_data, output_filepath)
     print(f"Generated industrial specifications, output saved to {output_filepath}")
+    return output_filepath
+
+def main():
+    """Main function to run the industrial specifications analysis."""
+    usage_msg = "Usage: python specifications-industrial.py <input_json> [output_json] [-saveInputs] [-uuid=\"UUID\"] [-flow_uuid=\"FLOW-UUID\"]"
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
+
+    input_data = load_json(input_filepath)
+    if run(input_data, specified_output_filepath, save_inputs, flow_uuid_arg) is None:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,45 +1,109 @@
 import json
 import sys
 import uuid
-from datetime import datetime
+import time
 from utils import (
-    load_json, save_output, chat_with_llm,
-    create_output_metadata, get_output_filepath, handle_command_args
+    load_json, save_output, chat_with_llm, chat_with_llm_many,
+    create_output_metadata, get_output_filepath, handle_command_args,
+    pop_flag_value, run_batch_inputs,
+    cache_namespace_for
 )
 
+# Texts longer than this are summarized in parts of about this size, then the part summaries are combined
+SUMMARY_CHUNK_CHARS = 8000
+# Most part summaries requested at once
+MAX_PARALLEL_CHUNKS = 8
+
+# Built once at import and sent unchanged with every request, so the prompt prefix is identical each time
+SUMMARY_SYSTEM_MSG = (
+    "You are an AI assistant specialized in summarizing content. "
+    "Your goal is to provide a concise and clear summary of the provided text. "
+    "Ensure that the summary captures the key points, main ideas, and critical details. "
+    "Keep the summary brief, precise, and easy to understand. "
+    "Avoid unnecessary details or opinions. "
+    "Follow the output format as specified by the user if provided; otherwise, return a plain text summary."
+)
+
+def split_into_chunks(paragraphs, max_chars=SUMMARY_CHUNK_CHARS):
+    """Group paragraphs into chunks of at most max_chars, splitting only paragraphs longer than that."""
+    chunks = []
+    current = []
+    current_length = 0
+    for paragraph in paragraphs:
+        # Cut an over-long paragraph at the last space before the limit
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            head, paragraph = paragraph[:cut], paragraph[cut:].lstrip()
+            if current:
+                chunks.append(" ".join(current))
+                current, current_length = [], 0
+            chunks.append(head)
+        if current and current_length + 1 + len(paragraph) > max_chars:
+            chunks.append(" ".join(current))
+            current, current_length = [], 0
+        current.append(paragraph)
+        current_length += len(paragraph) + (1 if current_length else 0)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
 def generate_summary(input_data):
     """Generate a summary of the input text."""
-    text = " ".join(input_data.get("input_text", []))
+    input_text = input_data.get("input_text", [])
+    if isinstance(input_text, str):
+        input_text = [input_text]
+    text = " ".join(input_text)
     model = input_data.get("model", "gemma3")
     parameters = input_data.get("parameters", {})
     max_length = input_data.get("max_length", 200)
-
-    systemMsg = (
-        "You are an AI assistant specialized in summarizing content. "
-        "Your goal is to provide a concise and clear summary of the provided text. "
-        "Ensure that the summary captures the key points, main ideas, and critical details. "
-        "Keep the summary brief, precise, and easy to understand. "
-        "Avoid unnecessary details or opinions. "
-        "Follow the output format as specified by the user if provided; otherwise, return a plain text summary."
-    )
     
-    user_msg = f"Summarize the following text:\n\n{text}"
+    cache_namespace = cache_namespace_for("summary", parameters)
     
-    # Use chat_with_llm instead of direct ollama.chat
-    summary = chat_with_llm(model, systemMsg, user_msg, parameters)
+    if len(text) <= SUMMARY_CHUNK_CHARS:
+        # Use chat_with_llm instead of direct ollama.chat (deterministic runs on the same text come from the cache)
+        user_msg = f"Summarize the following text:\n\n{text}"
+        return chat_with_llm(model, SUMMARY_SYSTEM_MSG, user_msg, parameters, cache_namespace=cache_namespace)
     
-    return summary
+    # Long text: summarize the parts concurrently (map), then combine their summaries in one more call (reduce),
+    # so the wait is about one part's summary plus the combination and no prompt outgrows the context window
+    chunks = split_into_chunks(input_text)
+    part_summaries = chat_with_llm_many(
+        model, SUMMARY_SYSTEM_MSG, [f"Summarize the following text:\n\n{chunk}" for chunk in chunks], parameters,
+        cache_namespace=cache_namespace, max_concurrent=MAX_PARALLEL_CHUNKS
+    )
+    
+    combine_msg = (
+        "The following are summaries of consecutive parts of one text. "
+        "Combine them into a single summary of the whole text:\n\n" + "\n\n".join(part_summaries)
+    )
+    return chat_with_llm(model, SUMMARY_SYSTEM_MSG, combine_msg, parameters, cache_namespace=cache_namespace)
+
+def build_output(input_data):
+    """Summarize one input and return the output fields."""
+    return {
+        "summary": generate_summary(input_data).splitlines()
+    }
 
 def main():
     """Main function to run the summary generation."""
-    usage_msg = "Usage: python summary.py <input_json> [output_json]"
-    input_filepath, specified_output_filepath = handle_command_args(usage_msg)
+    usage_msg = "Usage: python summary.py <input_json> [output_json] | --batch-inputs <input_glob>"
+    
+    # --batch-inputs: run every matching input file in this process, each to its own output file
+    batch_pattern = pop_flag_value("--batch-inputs", usage_msg)
+    if batch_pattern:
+        if run_batch_inputs(batch_pattern, build_output, "summary", "Text Summary"):
+            sys.exit(1)
+        return
+    
+    input_filepath, specified_output_filepath, save_inputs, custom_uuid, flow_uuid_arg = handle_command_args(usage_msg)
 
     print("Working...")
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     
     input_data = load_json(input_filepath)
-    summary = generate_summary(input_data)
+    output_fields = build_output(input_data)
     
     # Get output filepath and UUID
     output_filepath, output_uuid = get_output_filepath(
@@ -53,7 +117,7 @@ def main():
     # Combine metadata with output content
     output_data = {
         **metadata,
-        "summary": summary.split("\n")
+        **output_fields
     }
 
     save_output(output_data, output_filepath)
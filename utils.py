@@ -1,80 +1,524 @@
+import functools
+import glob
 import json
 import ollama
+import httpx
 import uuid
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 import os
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from llm_cache import (
+    make_cache_key, load_cached_response, save_cached_response,
+    find_similar_response, add_semantic_entry
+)
+
+try:
+    # orjson parses and serializes in native code, straight from/to UTF-8 bytes
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # json_repair fixes malformed JSON from LLMs when nothing else parses. Optional (pip install json-repair):
+    # without it, unparseable responses go straight to the plain-text fallbacks
+    import json_repair
+except ImportError:
+    json_repair = None
+
+# Markdown code fences around LLM JSON output, with or without a language tag
+LLM_FENCE_RE = re.compile(r"```(?:json)?")
+# Outermost JSON object or array in a cleaned LLM response
+LLM_JSON_BLOCK_RE = re.compile(r"(\{[\s\S]*\}|\[[\s\S]*\])")
+# Control characters that are invalid in JSON (ASCII 0-31 except tab, newline and carriage return, plus DEL)
+JSON_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+
+# One client per process so the HTTP connection to the Ollama server is reused between calls
+# (host comes from OLLAMA_HOST, as with the module-level ollama functions). The pool keeps enough
+# idle connections for every thread of a parallel tree expansion, so none has to reconnect
+LLM_MAX_KEEPALIVE_CONNECTIONS = 64
+ollama_client = ollama.Client(
+    limits=httpx.Limits(max_connections=None, max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS)
+)
+
+# Models named "vllm://<name>" are sent to an OpenAI-compatible vLLM server, whose continuous batching
+# keeps up with wide tree expansions; "ollama://<name>" is the same as a plain name
+VLLM_MODEL_PREFIX = "vllm://"
+OLLAMA_MODEL_PREFIX = "ollama://"
+VLLM_BASE_URL = os.environ.get("VLLM_BASE_URL", "http://localhost:8000/v1")
+vllm_client = httpx.Client(
+    base_url=VLLM_BASE_URL,
+    timeout=None, # Long generations are normal; Ollama's client doesn't time out either
+    limits=httpx.Limits(max_connections=None, max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS)
+)
+# Ollama option name -> OpenAI-compatible request field
+VLLM_OPTION_NAMES = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "top_k": "top_k",
+    "seed": "seed",
+    "stop": "stop",
+    "num_predict": "max_tokens",
+    "repeat_penalty": "repetition_penalty",
+    "presence_penalty": "presence_penalty",
+    "frequency_penalty": "frequency_penalty",
+}
+
+# Cached requests currently waiting on the model: (cache namespace, cache key) -> Future of the response text
+_in_flight_responses = {}
+_in_flight_lock = threading.Lock()
+
+# Keep the model loaded between calls instead of letting Ollama unload it after each request
+LLM_KEEP_ALIVE = "30m"
+
+# Opening of the system message shared by the flow's analysis steps (3-9), so calls to the
+# same model start with identical tokens and Ollama can reuse that prefix from its KV cache
+AUTOMATION_SYSTEM_PREFIX = (
+    "You are an AI assistant specialized in analyzing automation: how the work in a field or topic "
+    "is done today, how far it can be automated, and what that would take. "
+    "Each request asks for one part of that analysis about the topic it names.\n\n"
+)
+
+# Embedding model used to match paraphrased prompts in the semantic cache
+EMBEDDING_MODEL = "nomic-embed-text"
+
+def json_loads(data):
+    """Parse JSON from str or UTF-8 bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 def load_json(filepath):
     """Load JSON input file."""
-    with open(filepath, "r", encoding="utf-8") as file:
-        return json.load(file)
+    # Read raw bytes and let the parser handle UTF-8 decoding
+    with open(filepath, "rb") as file:
+        return json_loads(file.read())
 
-def save_output(output_data, output_filepath):
-    """Save generated output to a JSON file."""
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
-    with open(output_filepath, "w", encoding="utf-8") as file:
-        json.dump(output_data, file, indent=4, ensure_ascii=False)
+def json_dumps(data, pretty=True):
+    """Serialize data to UTF-8 JSON bytes, using orjson when available (compact when pretty=False)."""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS writes int/float/bool keys as strings, as the json module does, instead of raising
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2 if pretty else orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(data, option=option)
+    elif pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    else:
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+# Output directories save_output has already made (or found) in this process
+_dirs_created = set()
+
+def save_output(output_data, output_filepath, pretty=True):
+    """Save generated output to a JSON file (compact when pretty=False, for machine-read files)."""
+    payload = json_dumps(output_data, pretty)
+    
+    # Ensure directory exists (a bare filename has no directory part), once per directory per process
+    output_dir = os.path.dirname(output_filepath)
+    if output_dir and output_dir not in _dirs_created:
+        os.makedirs(output_dir, exist_ok=True)
+        _dirs_created.add(output_dir)
+    # Write the whole buffer to a temp file and swap it in, so readers never see a partial file
+    # (named per process and thread, so concurrent saves of the same path never share a temp file)
+    tmp_filepath = f"{output_filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_filepath, "wb") as file:
+        file.write(payload)
+    os.replace(tmp_filepath, output_filepath)
+
+def save_output_append(record, output_filepath):
+    """Append record to a JSON Lines file as one line, so a growing log never rewrites what is already there."""
+    if orjson is not None:
+        payload = orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    else:
+        payload = json_dumps(record, pretty=False) + b"\n"
+    output_dir = os.path.dirname(output_filepath)
+    if output_dir and output_dir not in _dirs_created:
+        os.makedirs(output_dir, exist_ok=True)
+        _dirs_created.add(output_dir)
+    # One write call per record, so lines appended from several threads don't interleave
+    with open(output_filepath, "ab") as file:
+        file.write(payload)
+
+def load_jsonl(filepath):
+    """Yield the records of a JSON Lines file, skipping lines that don't parse; yields nothing if it doesn't exist."""
+    try:
+        with open(filepath, "rb") as file:
+            for line in file:
+                try:
+                    yield json_loads(line)
+                except ValueError:
+                    continue # Skip a line cut short by a crash
+    except OSError:
+        return
+
+def apply_input_overrides(input_data, overrides):
+    """Return input_data with overrides applied on top; "parameters" are merged key by key.
+    
+    The result shares every value that isn't overridden with input_data, so large
+    fields such as article text are not copied.
+    """
+    return {
+        **input_data,
+        **overrides,
+        "parameters": {**input_data.get("parameters", {}), **overrides.get("parameters", {})}
+    }
+
+def sanitize_json_string(json_str):
+    """Remove control characters and other invalid characters from a JSON string."""
+    # Replace control characters that are invalid in JSON
+    sanitized = JSON_CONTROL_CHARS_RE.sub('', json_str)
+    return sanitized
+
+def extract_json_from_response(response):
+    """Extract and parse JSON from various formats in LLM responses."""
+    # First try direct parsing
+    try:
+        return json.loads(sanitize_json_string(response))
+    except json.JSONDecodeError:
+        pass
+    
+    # Try extracting from code fence markers
+    fence_start = response.find("```")
+    if fence_start != -1:
+        try:
+            # Extract content between code fence markers with or without language specifier,
+            # slicing it straight out of the response instead of splitting off copies of the rest
+            json_fence_start = response.find("```json", fence_start)
+            if json_fence_start != -1:
+                content_start = json_fence_start + len("```json")
+            else:
+                content_start = fence_start + len("```")
+            content_end = response.find("```", content_start)
+            if content_end == -1:
+                # Unclosed fence: take everything after it
+                content_end = len(response)
+            json_content = response[content_start:content_end].strip()
+
+            return json.loads(sanitize_json_string(json_content))
+        except json.JSONDecodeError as e:
+            print(f"Error extracting JSON from code block: {str(e)}")
+    
+    # Look for content between curly braces
+    try:
+        if "{" in response and "}" in response:
+            start = response.find("{")
+            end = response.rfind("}") + 1
+            potential_json = response[start:end]
+            return json.loads(sanitize_json_string(potential_json))
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON between curly braces: {str(e)}")
+    
+    # Last resort: repair common LLM mistakes (single quotes, trailing commas, unquoted keys, ...)
+    if json_repair is not None:
+        repaired = json_repair.loads(sanitize_json_string(response))
+        if isinstance(repaired, (dict, list)) and repaired:
+            return repaired
+    
+    return None
+
+# Leading characters of a step searched for the start of embedded JSON
+EMBEDDED_JSON_PROBE_CHARS = 64
+
+# JSON array and object openers and the character each must end with
+JSON_CLOSERS = {"[": "]", "{": "}"}
+
+def _looks_like_json(text):
+    """
+    Return whether text could be a JSON array or object: its first non-blank character opens one and its
+    last non-blank character closes it. Only the first EMBEDDED_JSON_PROBE_CHARS are stripped, so ordinary
+    long steps cost next to nothing, and output cut off mid-array is rejected without raising a decode error.
+    """
+    if len(text) < 2:
+        return False
+    closer = JSON_CLOSERS.get(text[:EMBEDDED_JSON_PROBE_CHARS].lstrip()[:1])
+    # rstrip returns text itself when there is no trailing whitespace, so this rarely copies
+    return closer is not None and text.rstrip()[-1:] == closer
 
 def parse_embedded_json(node):
     """
-    Recursively check if the 'step' field contains embedded JSON.
+    Check every node in the tree for a 'step' field that contains embedded JSON.
     If so, parse it and update the node's 'children' accordingly.
     """
-    # If 'step' is a string that looks like JSON, try to parse it.
-    step_value = node.get("step", "")
-    if isinstance(step_value, str) and (step_value.strip().startswith('[') or step_value.strip().startswith('{')):
-        try:
-            parsed = json.loads(step_value)
-            # If parsed is a list, replace the children with parsed nodes
-            if isinstance(parsed, list):
-                new_children = []
-                for item in parsed:
-                    if isinstance(item, dict):
-                        new_children.append(item)
-                    else:
-                        new_children.append({"step": str(item), "children": []})
-                node["children"] = new_children
-                # Don't clear the step field completely to avoid empty steps
-                if not node.get("title"):
-                    node["title"] = step_value
-            elif isinstance(parsed, dict):
-                node["children"] = [parsed]
-                if not node.get("title"):
-                    node["title"] = step_value
-        except json.JSONDecodeError:
-            # If parsing fails, leave the node unchanged.
-            pass
-
-    # Recursively process all children.
-    for child in node.get("children", []):
-        parse_embedded_json(child)
+    # Walk the tree with an explicit stack, so deep trees can't hit the recursion limit
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        
+        # If 'step' is a string that looks like JSON, try to parse it.
+        step_value = current.get("step", "")
+        if isinstance(step_value, str) and _looks_like_json(step_value):
+            try:
+                parsed = json_loads(step_value)
+                # If parsed is a list, replace the children with parsed nodes
+                if isinstance(parsed, list):
+                    new_children = []
+                    for item in parsed:
+                        if isinstance(item, dict):
+                            new_children.append(item)
+                        else:
+                            new_children.append({"step": str(item), "children": []})
+                    current["children"] = new_children
+                    # Don't clear the step field completely to avoid empty steps
+                    if not current.get("title"):
+                        current["title"] = step_value
+                elif isinstance(parsed, dict):
+                    current["children"] = [parsed]
+                    if not current.get("title"):
+                        current["title"] = step_value
+            except json.JSONDecodeError:
+                # If parsing fails, leave the node unchanged.
+                pass
+
+        # Process all children (including any just parsed from the step) the same way.
+        stack.extend(current.get("children", []))
     return node
 
-def chat_with_llm(model, system_message, user_message, parameters=None):
-    """Generic function to interact with LLMs via Ollama."""
+def cache_namespace_for(namespace, parameters=None):
+    """Return namespace if responses for these parameters are deterministic enough to cache, else None."""
+    if (parameters or {}).get("temperature", 0) == 0:
+        return namespace
+    return None
+
+def embed_text(text):
+    """Return the embedding of text, or None if the embedding model is unavailable."""
+    try:
+        response = ollama_client.embed(model=EMBEDDING_MODEL, input=text, keep_alive=LLM_KEEP_ALIVE)
+        return list(response["embeddings"][0])
+    except Exception as e:
+        print(f"Warning: Could not embed prompt for the semantic cache: {e}")
+        return None
+
+def chat_with_llm(model, system_message, user_message, parameters=None, cache_namespace=None, on_chunk=None, semantic=False,
+                  response_format=None, semantic_text=None):
+    """Generic function to interact with LLMs via Ollama.
+    
+    When cache_namespace is given, identical (model, messages, parameters) requests are
+    answered from the on-disk cache under .cache/<cache_namespace>/ instead of the model.
+    With semantic=True, a user message that is a close paraphrase of a cached one (by
+    embedding similarity, same model, system message and parameters) is answered too.
+    semantic_text is the variable part at the end of user_message (a step, a topic) to embed
+    instead of the whole message, so a long fixed template can't make different requests look
+    alike; only entries made with the same template before it are compared.
+    A model named "vllm://<name>" is served by the OpenAI-compatible server at VLLM_BASE_URL
+    instead of Ollama ("ollama://<name>" and plain names go to Ollama).
+    When on_chunk is given, the response is streamed and on_chunk is called with each
+    piece of text as it arrives; the full text is still returned.
+    response_format is passed to Ollama as the request's format: "json", or a JSON schema
+    dict the output must match, so the model can't answer with prose or code fences.
+    """
     if parameters is None:
         parameters = {}
     
-    response = ollama.chat(
-        model=model,
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user", "content": user_message}
-        ],
-        options=parameters
-    )
-    return response["message"]["content"].strip()
+    if not cache_namespace:
+        return _request_chat(model, system_message, user_message, parameters, on_chunk, response_format)
+    
+    cache_key = make_cache_key(model, system_message, user_message, parameters)
+    cached = load_cached_response(cache_namespace, cache_key)
+    embedding = None
+    if cached is None and semantic:
+        if not semantic_text or not user_message.endswith(semantic_text):
+            embedding = embed_text(user_message)
+            template = ""
+        else:
+            embedding = embed_text(semantic_text)
+            # The rest of the message goes into the context, so entries whose embedding is of a different text
+            # (another template, or the whole message) are never compared with this one. Only the trailing slot
+            # is cut off: the same words inside the template's own wording stay part of it
+            template = user_message[:-len(semantic_text)]
+        if embedding is not None:
+            context_key = make_cache_key(model, system_message, template, parameters)
+            cached = find_similar_response(cache_namespace, context_key, embedding)
+    if cached is not None:
+        if on_chunk is not None:
+            on_chunk(cached)
+        return cached
+    
+    # An identical request already on its way to the model (another thread of a parallel run) is
+    # waited for instead of being sent again; it will come back with the same cached answer
+    flight_key = (cache_namespace, cache_key)
+    with _in_flight_lock:
+        pending = _in_flight_responses.get(flight_key)
+        if pending is None:
+            response_future = _in_flight_responses[flight_key] = Future()
+    if pending is not None:
+        content = pending.result()
+        if on_chunk is not None:
+            on_chunk(content)
+        return content
+    
+    try:
+        content = _request_chat(model, system_message, user_message, parameters, on_chunk, response_format)
+        save_cached_response(cache_namespace, cache_key, content)
+        if embedding is not None:
+            add_semantic_entry(cache_namespace, context_key, embedding, cache_key)
+    except BaseException as e:
+        response_future.set_exception(e)
+        raise
+    else:
+        response_future.set_result(content)
+    finally:
+        with _in_flight_lock:
+            del _in_flight_responses[flight_key]
+    return content
+
+# Most requests chat_with_llm_many sends at once; match it to the Ollama server's OLLAMA_NUM_PARALLEL
+MAX_PARALLEL_LLM_CALLS = 8
+
+def chat_with_llm_many(model, system_message, user_messages, parameters=None, cache_namespace=None,
+                       max_concurrent=MAX_PARALLEL_LLM_CALLS, response_format=None):
+    """
+    Send several independent user messages with the same system message and return the responses in order.
+    The requests overlap on a thread pool, so the wait is about the slowest one rather than the sum;
+    cache hits are answered by chat_with_llm without reaching the model.
+    """
+    user_messages = list(user_messages)
+    if len(user_messages) <= 1:
+        return [chat_with_llm(model, system_message, user_message, parameters, cache_namespace=cache_namespace,
+                              response_format=response_format) for user_message in user_messages]
+    with ThreadPoolExecutor(max_workers=min(len(user_messages), max_concurrent)) as executor:
+        return list(executor.map(
+            lambda user_message: chat_with_llm(model, system_message, user_message, parameters,
+                                               cache_namespace=cache_namespace, response_format=response_format),
+            user_messages
+        ))
+
+@functools.lru_cache(maxsize=64)
+def _system_message_entry(system_message):
+    """Return the system entry of a chat request, built once per system message and shared (never modified)."""
+    return {"role": "system", "content": system_message}
+
+def _request_chat(model, system_message, user_message, parameters, on_chunk=None, response_format=None):
+    """Send one chat request to the model's backend and return the response text."""
+    messages = [
+        _system_message_entry(system_message),
+        {"role": "user", "content": user_message}
+    ]
+    
+    if model.startswith(VLLM_MODEL_PREFIX):
+        content = chat_with_vllm(model[len(VLLM_MODEL_PREFIX):], messages, parameters, response_format, on_chunk)
+    elif on_chunk is None:
+        model = model.removeprefix(OLLAMA_MODEL_PREFIX)
+        response = ollama_client.chat(
+            model=model,
+            messages=messages,
+            options=parameters,
+            keep_alive=LLM_KEEP_ALIVE,
+            format=response_format
+        )
+        content = response["message"]["content"].strip()
+    else:
+        model = model.removeprefix(OLLAMA_MODEL_PREFIX)
+        # Hand each piece to the caller as the model produces it
+        chunks = []
+        for part in ollama_client.chat(
+            model=model,
+            messages=messages,
+            options=parameters,
+            keep_alive=LLM_KEEP_ALIVE,
+            format=response_format,
+            stream=True
+        ):
+            piece = part["message"]["content"]
+            if piece:
+                chunks.append(piece)
+                on_chunk(piece)
+        content = "".join(chunks).strip()
+    return content
+
+def chat_with_vllm(model, messages, parameters, response_format=None, on_chunk=None):
+    """Send a chat request to the OpenAI-compatible vLLM server and return the response text."""
+    request = {"model": model, "messages": messages}
+    # Ollama option names that have an OpenAI-compatible equivalent
+    for option, value in parameters.items():
+        if option in VLLM_OPTION_NAMES:
+            request[VLLM_OPTION_NAMES[option]] = value
+    if response_format == "json":
+        request["response_format"] = {"type": "json_object"}
+    elif response_format is not None:
+        request["response_format"] = {"type": "json_schema", "json_schema": {"name": "response", "schema": response_format}}
+    
+    if on_chunk is None:
+        response = vllm_client.post("/chat/completions", json=request)
+        response.raise_for_status()
+        return (response.json()["choices"][0]["message"]["content"] or "").strip()
+    
+    # Server-sent events: one "data: {...}" line per piece, then "data: [DONE]"
+    request["stream"] = True
+    chunks = []
+    with vllm_client.stream("POST", "/chat/completions", json=request) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            choices = json_loads(line[len("data: "):]).get("choices") or [{}]
+            piece = choices[0].get("delta", {}).get("content")
+            if piece:
+                chunks.append(piece)
+                on_chunk(piece)
+    return "".join(chunks).strip()
+
+class JsonArrayStreamScanner:
+    """Pick complete objects out of a streamed JSON array as soon as each one closes.
+    
+    feed() takes the next piece of response text and returns the top-level array
+    elements that became complete, parsed. Text around the array (prose, code
+    fences) is ignored; elements that don't parse are skipped, so callers should
+    still parse the full response once it has arrived.
+    """
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        self.depth = 0
+        self.root = None # Opening bracket of the outermost container
+        self.in_string = False
+        self.escaped = False
+        self.item_start = None
+
+    def feed(self, piece):
+        """Add streamed text; return the objects completed by it."""
+        self.text += piece
+        items = []
+        text = self.text
+        for i in range(self.position, len(text)):
+            char = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                # Quotes in prose before the JSON starts don't open strings
+                self.in_string = self.depth > 0
+            elif char in "[{":
+                if self.depth == 0 and self.root is None:
+                    self.root = char
+                elif self.depth == 1 and char == "{":
+                    self.item_start = i
+                self.depth += 1
+            elif char in "]}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 1 and self.item_start is not None:
+                    if self.root == "[":
+                        try:
+                            items.append(json_loads(text[self.item_start:i + 1]))
+                        except json.JSONDecodeError:
+                            pass
+                    self.item_start = None
+        self.position = len(text)
+        return items
 
 def clean_llm_json_response(response_text):
     """Clean an LLM response to extract valid JSON."""
-    # Remove markdown code fences
+    # Remove markdown code fences; most responses have none, which a plain substring test shows without the regex
     text = response_text.strip()
-    text = text.replace("```json", "").replace("```", "")
+    if "```" in text:
+        text = LLM_FENCE_RE.sub("", text)
     # Extract JSON object or array from text
-    match = re.search(r"(\{[\s\S]*\}|\[[\s\S]*\])", text, re.S)
+    match = LLM_JSON_BLOCK_RE.search(text)
     if match:
         return match.group(1)
     # Fallback: return cleaned text
@@ -90,22 +534,67 @@ def parse_llm_json_response(response_text, include_children=False):
     cleaned_text = clean_llm_json_response(response_text)
     
     try:
-        return json.loads(cleaned_text)
+        return json_loads(cleaned_text)
     except json.JSONDecodeError:
-        # Fallback: return each line as a separate item
+        # Repair common LLM mistakes (single quotes, trailing commas, ...) before giving up on JSON, but only
+        # for text that was meant to be JSON and only if the repair gives objects: on a plain-text list, json_repair
+        # turns "[Optional] add salt" into ["Optional"], dropping lines and the step dicts callers expect
+        if json_repair is not None and cleaned_text[:1] in ("[", "{"):
+            repaired = json_repair.loads(cleaned_text)
+            if isinstance(repaired, dict) and repaired:
+                return repaired
+            if isinstance(repaired, list) and repaired and all(isinstance(item, dict) for item in repaired):
+                return repaired
+        # Fallback: return each non-blank line that isn't a markdown heading as a separate item
+        # (splitlines and str.strip both run in C, several times faster than a multiline regex)
+        lines = [line for line in map(str.strip, cleaned_text.splitlines()) if line and line[0] != "#"]
         if include_children:
-            return [{"step": s.strip(), "children": []} 
-                    for s in cleaned_text.split("\n") 
-                    if s.strip() and not s.strip().startswith('#')]
+            return [{"step": s, "children": []} for s in lines]
         else:
-            return [{"step": s.strip()} 
-                    for s in cleaned_text.split("\n") 
-                    if s.strip() and not s.strip().startswith('#')]
+            return [{"step": s} for s in lines]
+
+@functools.lru_cache(maxsize=256)
+def _format_criteria_list(criteria):
+    """Indented JSON text of a tuple of success criteria, serialized once per distinct list."""
+    return json_dumps(list(criteria)).decode("utf-8")
+
+def format_success_criteria(input_data):
+    """Return input_data's success criteria as indented JSON text, without changing input_data."""
+    criteria = input_data["success_criteria"]
+    if isinstance(criteria, list):
+        try:
+            # The usual list of strings is memoized, so batches sharing criteria serialize them once
+            return _format_criteria_list(tuple(criteria))
+        except TypeError:
+            pass # Unhashable items (nested lists or objects) are serialized every time
+    return json_dumps(criteria).decode("utf-8")
+
+def build_conversion_prompt(input_data):
+    """Build the user prompt for the text conversion scripts in one join."""
+    prompt_parts = [
+        " ".join(input_data.get("input_text", [])),
+        "\nOutput Format: ",
+        input_data["output_format"],
+    ]
+    if "success_criteria" in input_data:
+        prompt_parts.append("\n\nSuccess Criteria:\n")
+        prompt_parts.append(format_success_criteria(input_data))
+    return "".join(prompt_parts)
+
+def format_time_taken(start_time):
+    """Format the time since start_time as a timedelta string.
+    
+    start_time is a time.perf_counter() value (monotonic, so clock adjustments can't
+    skew it) or, for older callers, a datetime.
+    """
+    if isinstance(start_time, datetime):
+        return str(datetime.now() - start_time)
+    return str(timedelta(seconds=time.perf_counter() - start_time))
 
 def create_output_metadata(task_name, start_time, output_uuid=None):
     """Create standard metadata for output files."""
     end_time = datetime.now()
-    time_taken = end_time - start_time
+    time_taken = format_time_taken(start_time)
     
     # No need to generate UUID here, it should be passed from get_output_filepath
     # or generated at a higher level
@@ -113,9 +602,24 @@ def create_output_metadata(task_name, start_time, output_uuid=None):
         "uuid": output_uuid,
         "date_created": end_time.isoformat(),
         "task": task_name,
-        "time_taken": str(time_taken)
+        "time_taken": time_taken
     }
 
+# UUIDs made per os.urandom call by new_uuid
+UUID_POOL_SIZE = 64
+_uuid_pool = []
+_uuid_pool_lock = threading.Lock()
+
+def new_uuid():
+    """Return a random (version 4) UUID string, drawing the randomness for UUID_POOL_SIZE of them at a time."""
+    with _uuid_pool_lock:
+        if not _uuid_pool:
+            random_bytes = os.urandom(16 * UUID_POOL_SIZE)
+            _uuid_pool.extend(
+                str(uuid.UUID(bytes=random_bytes[i:i + 16], version=4)) for i in range(0, len(random_bytes), 16)
+            )
+        return _uuid_pool.pop()
+
 def get_output_filepath(output_dir, output_uuid=None, specified_path=None):
     """Determine output filepath based on arguments or generate a default one."""
     if specified_path:
@@ -123,46 +627,112 @@ def get_output_filepath(output_dir, output_uuid=None, specified_path=None):
         
     # Create a UUID for this output if not provided
     if output_uuid is None:
-        output_uuid = str(uuid.uuid4())
+        output_uuid = new_uuid()
     
     # Ensure output directory exists
     output_path = f"output/{output_dir}"
-    os.makedirs(output_path, exist_ok=True)
+    if output_path not in _dirs_created:
+        os.makedirs(output_path, exist_ok=True)
+        _dirs_created.add(output_path)
     
     return f"{output_path}/{output_uuid}.json", output_uuid
 
 def handle_command_args(usage_msg, min_args=1, max_args=2):
     """Process command line arguments with validation."""
-    # Check for -saveInputs flag
-    save_inputs = "-saveInputs" in sys.argv
-    if save_inputs:
-        # Remove the flag from argv for further processing
-        sys.argv.remove("-saveInputs")
-    
-    # Check for -uuid flag
+    # Take the -saveInputs, -uuid= and -flow_uuid= flags out of sys.argv in one pass, leaving the positional arguments
+    save_inputs = False
     custom_uuid = None
-    for arg in list(sys.argv):  # Create a copy of sys.argv to modify while iterating
-        if arg.startswith("-uuid="):
-            custom_uuid = arg.split("=", 1)[1].strip('"')
-            if custom_uuid:  # Only remove if we got a valid UUID
-                sys.argv.remove(arg)
-                
-    # Check for -flow_uuid flag
     flow_uuid = None
-    for arg in list(sys.argv):
-        if arg.startswith("-flow_uuid="):
-            flow_uuid = arg.split("=", 1)[1].strip('"')
-            if flow_uuid:
-                sys.argv.remove(arg)
+    args = []
+    for arg in sys.argv:
+        if arg == "-saveInputs":
+            save_inputs = True
+            continue
+        if arg.startswith("-uuid="):
+            value = arg[len("-uuid="):].strip('"')
+            if value:  # Only remove if we got a valid UUID
+                custom_uuid = value
+                continue
+        elif arg.startswith("-flow_uuid="):
+            value = arg[len("-flow_uuid="):].strip('"')
+            if value:
+                flow_uuid = value
+                continue
+        args.append(arg)
+    sys.argv[:] = args
     
-    if len(sys.argv) > max_args + 1 or len(sys.argv) < min_args + 1:
+    arg_count = len(args) - 1
+    if not min_args <= arg_count <= max_args:
         print(usage_msg)
         sys.exit(1)
-        
-    input_filepath = sys.argv[1]
-    output_filepath = sys.argv[2] if len(sys.argv) > 2 else None
     
-    return input_filepath, output_filepath, save_inputs, custom_uuid, flow_uuid
+    return args[1], (args[2] if arg_count > 1 else None), save_inputs, custom_uuid, flow_uuid
+
+def pop_flag_value(flag, usage_msg):
+    """Remove "flag value" from sys.argv and return the value, or None if the flag isn't given."""
+    if flag not in sys.argv:
+        return None
+    position = sys.argv.index(flag)
+    if position + 1 >= len(sys.argv):
+        print(usage_msg)
+        sys.exit(1)
+    value = sys.argv[position + 1]
+    del sys.argv[position:position + 2]
+    return value
+
+# Most input files processed at once in --batch-inputs mode
+MAX_PARALLEL_INPUTS = 8
+
+def run_batch_inputs(input_pattern, build_output, output_dir, task_name, max_concurrent=MAX_PARALLEL_INPUTS):
+    """
+    Run a script's step on every input file matching input_pattern in this one process, so the
+    inputs share the Ollama connection, the loaded model and the response cache.
+    
+    build_output(input_data) returns the output fields for one input; each result is saved with
+    metadata to its own file under output/<output_dir>/. Finished inputs are recorded in
+    output/<output_dir>/batch-checkpoint.jsonl, so rerunning after a crash skips them (unless the
+    input file has changed since). Returns the number of inputs that failed.
+    """
+    input_filepaths = sorted(glob.glob(input_pattern))
+    if not input_filepaths:
+        print(f"Error: No input files match {input_pattern}")
+        return 1
+    
+    # Inputs already done by an earlier run, with the modification time they had then
+    checkpoint_path = os.path.join("output", output_dir, "batch-checkpoint.jsonl")
+    finished = {}
+    for entry in load_jsonl(checkpoint_path):
+        try:
+            finished[entry["input"]] = entry["mtime"]
+        except (KeyError, TypeError):
+            continue
+    pending = [path for path in input_filepaths if finished.get(path) != os.path.getmtime(path)]
+    if len(pending) < len(input_filepaths):
+        print(f"Skipping {len(input_filepaths) - len(pending)} inputs finished by an earlier run")
+    
+    checkpoint_lock = threading.Lock()
+    
+    def process(input_filepath):
+        start_time = time.perf_counter()
+        try:
+            input_mtime = os.path.getmtime(input_filepath)
+            output_fields = build_output(load_json(input_filepath))
+            output_filepath, output_uuid = get_output_filepath(output_dir)
+            save_output({**create_output_metadata(task_name, start_time, output_uuid), **output_fields}, output_filepath)
+        except Exception as e:
+            print(f"Failed on {input_filepath}: {e}")
+            return False
+        with checkpoint_lock:
+            save_output_append({"input": input_filepath, "mtime": input_mtime, "output": output_filepath}, checkpoint_path)
+        print(f"{input_filepath} -> {output_filepath}")
+        return True
+    
+    print("Working...")
+    with ThreadPoolExecutor(max_workers=max(1, min(len(pending), max_concurrent))) as executor:
+        results = list(executor.map(process, pending))
+    failures = results.count(False)
+    print(f"Processed {len(results) - failures} of {len(pending)} inputs")
+    return failures
 
 def saveToFile(system_message, user_message, filepath):
     """Save system message and user message to a JSON file.
@@ -188,24 +758,27 @@ def saveToFile(system_message, user_message, filepath):
     
     print(f"Saved LLM inputs to {filepath}")
 
-def translate_to_basic_english(text, model="gemma3", parameters=None):
+# System message for translate_to_basic_english, built once
+BASIC_ENGLISH_NAME_SYSTEM_MSG = ("Convert the given text into BASIC English. "
+                                 "Use only words from the BASIC English list (850 words). "
+                                 "Make all sentences short, clear, and simple. "
+                                 "Keep ONLY essential words needed to understand the meaning. "
+                                 "Make output VERY short, suitable for a folder name. "
+                                 "Output only the translated text without explanations.")
+
+def translate_to_basic_english(text, model="gemma3", parameters=None, use_cache=True):
     """Convert text to Basic English for use in folder names."""
     if parameters is None:
         parameters = {}
     
-    system_msg = ("Convert the given text into BASIC English. "
-                 "Use only words from the BASIC English list (850 words). "
-                 "Make all sentences short, clear, and simple. "
-                 "Keep ONLY essential words needed to understand the meaning. "
-                 "Make output VERY short, suitable for a folder name. "
-                 "Output only the translated text without explanations.")
-    
     user_msg = ("Convert to short, simple BASIC English for folder name. "
                 "Do not use special symbols that aren't allowed in file/folder names. "
                 f"Use a MAXIMUM of 4 words, ensure that the meaning is understandable: {text}")
     
     # Use chat_with_llm to translate the text
-    response = chat_with_llm(model, system_msg, user_msg, parameters)
+    # Folder names for recurring steps are cached, so repeated steps cost one lookup
+    response = chat_with_llm(model, BASIC_ENGLISH_NAME_SYSTEM_MSG, user_msg, parameters,
+                             cache_namespace="basic-english-names" if use_cache else None)
     
     # Clean up the response to ensure it's suitable for a folder name
     response = response.strip().split("\n")[0]